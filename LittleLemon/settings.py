@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,16 +49,51 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # FastJSONRenderer uses orjson when installed and hands floats and
+    # anything orjson rejects to DRF's JSONRenderer, so output matches it
+    'DEFAULT_RENDERER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'LittleLemonAPI.throttling.UserRouteThrottle',
+        'LittleLemonAPI.throttling.AnonRouteThrottle',
+    ],
+    # Token buckets: '<requests>/<period>' is both the burst size and the
+    # refill rate. menu_anon, cart_write and checkout are added per view.
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '120/min',
+        'anon': '60/min',
+        'menu_anon': '30/min',
+        'cart_write': '30/min',
+        'checkout': '5/min',
+    },
 }
 
+# 'local' keeps buckets in process memory; 'cache' shares them between
+# workers through the default cache, which then has to be a shared backend
+# (memcached, Redis or the database cache), not the per-process default
+THROTTLE_BUCKET_STORE = 'local'
+
+# Precompressed JSON snapshots of the public menu for the front proxy, see
+# LittleLemonAPI/snapshots.py. Catalog writes republish them when enabled;
+# 'manage.py publish_menu' rebuilds them on demand.
+MENU_SNAPSHOT_ROOT = BASE_DIR / 'menu_snapshots'
+MENU_SNAPSHOT_AUTOPUBLISH = True
+
 DJOSER = {
-    "USER_ID_FIELD": "username"
+    "USER_ID_FIELD": "username",
+    # Links sent in reset e-mails; the frontend posts uid and token back to
+    # users/reset_password_confirm/ and users/reset_username_confirm/
+    "PASSWORD_RESET_CONFIRM_URL": "password/reset/confirm/{uid}/{token}",
+    "USERNAME_RESET_CONFIRM_URL": "username/reset/confirm/{uid}/{token}",
 }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'LittleLemonAPI.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,6 +102,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Responses smaller than this (bytes) are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
 ROOT_URLCONF = 'LittleLemon.urls'
 
 TEMPLATES = [
@@ -97,6 +136,31 @@ DATABASES = {
     }
 }
 
+# Optional read replica for safe GETs on the menu, category and order list
+# views. Locally, point LITTLELEMON_REPLICA_DB at a second SQLite file.
+if os.environ.get('LITTLELEMON_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LITTLELEMON_REPLICA_DB'],
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['LittleLemonAPI.routers.ReplicaRouter']
+
+READ_REPLICA_ALIAS = 'replica'
+
+# Seconds a user's reads stay on 'default' after they write to cart/orders.
+# The pin is a signed cookie (see LittleLemonAPI/routers.py), so it holds
+# across workers for session clients. Token clients don't send it back, so
+# their order list always reads from 'default'.
+READ_REPLICA_STICKY_SECONDS = 5
+
+# Delivered orders older than this are moved to the archive tables by
+# 'manage.py archive_orders'
+ORDER_ARCHIVE_AFTER_DAYS = 90
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
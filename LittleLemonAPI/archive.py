@@ -0,0 +1,65 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, OrderState
+
+
+# Columns copied as-is from the live tables (attnames, so no FK lookups)
+ORDER_FIELDS = ['id', 'user_id', 'delivery_crew_id', 'state', 'version', 'total_cents', 'date']
+ORDER_ITEM_FIELDS = ['id', 'order_id', 'menuitem_id', 'quantity', 'unit_price_cents', 'price_cents']
+
+
+def archivable_orders(older_than_days=None):
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    cutoff = date.today() - timedelta(days=older_than_days)
+    return Order.objects.filter(state=OrderState.DELIVERED, date__lt=cutoff)
+
+
+def archive_batch(orders, order_ids):
+    """
+    Move one batch of orders and their items into the archive tables. Each
+    batch is its own short transaction so no lock is held for long.
+    `orders` is the archivable queryset the ids were scanned from; it is
+    applied again under the row locks, so an order that changed since the
+    scan stays where it is. Returns the number of orders moved.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            orders.filter(pk__in=order_ids).select_for_update().values_list('pk', flat=True)
+        )
+        orders = Order.objects.filter(pk__in=order_ids)
+        items = OrderItem.objects.filter(order_id__in=order_ids)
+        ArchivedOrder.objects.bulk_create(
+            [ArchivedOrder(**row) for row in orders.values(*ORDER_FIELDS)]
+        )
+        ArchivedOrderItem.objects.bulk_create(
+            [ArchivedOrderItem(**row) for row in items.values(*ORDER_ITEM_FIELDS)]
+        )
+        items.delete()
+        orders.delete()
+    return len(order_ids)
+
+
+def archive_delivered_orders(older_than_days=None, batch_size=1000, pause=0, progress=None):
+    """
+    Archive delivered orders older than `older_than_days` (default
+    settings.ORDER_ARCHIVE_AFTER_DAYS) in batches of `batch_size`, sleeping
+    `pause` seconds between batches to let other writers in. Returns the
+    number of orders archived.
+    """
+    orders = archivable_orders(older_than_days)
+    queryset = orders.order_by('pk').values_list('pk', flat=True)
+    archived = 0
+    while True:
+        order_ids = list(queryset[:batch_size])
+        if not order_ids:
+            return archived
+        archived += archive_batch(orders, order_ids)
+        if progress:
+            progress(archived)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import ORDER_TRANSITIONS, Order, OrderState, OrderTransition
+
+
+class OrderConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The order was changed by someone else.'
+    default_code = 'conflict'
+
+    def __init__(self, current=None):
+        super().__init__()
+        # {'state': ..., 'version': ...} of the row as it is now
+        self.current = current or {}
+
+
+def transition_order(order, to_state, actor, expected_version=None, delivery_crew=None):
+    """
+    Move `order` to `to_state` with a single conditional
+    UPDATE ... WHERE version = expected_version (no row lock), and record
+    the transition. `expected_version` defaults to the version `order` was
+    read at. Raises OrderConflict (409) when the row has moved on, carrying
+    the current state and version so the caller can retry without a GET.
+    """
+    if expected_version is None:
+        expected_version = order.version
+    if to_state not in ORDER_TRANSITIONS[order.state]:
+        raise ValidationError({'state': f'Cannot move an order from {order.state} to {to_state}'})
+    if to_state == OrderState.ASSIGNED and delivery_crew is None:
+        raise ValidationError({'delivery_crew': 'A delivery crew member is required'})
+
+    changes = {'state': to_state, 'version': F('version') + 1}
+    if delivery_crew is not None:
+        changes['delivery_crew'] = delivery_crew
+    with transaction.atomic():
+        updated = Order.objects.filter(
+            pk=order.pk, version=expected_version, state=order.state
+        ).update(**changes)
+        if not updated:
+            raise OrderConflict(Order.objects.filter(pk=order.pk).values('state', 'version').first())
+        OrderTransition.objects.create(
+            order_id=order.pk,
+            from_state=order.state,
+            to_state=to_state,
+            version=expected_version + 1,
+            delivery_crew_id=delivery_crew.pk if delivery_crew is not None else order.delivery_crew_id,
+            actor=actor,
+        )
+
+    order.state = to_state
+    order.version = expected_version + 1
+    if delivery_crew is not None:
+        order.delivery_crew = delivery_crew
+    return order
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.archive import archive_delivered_orders, archivable_orders
+
+
+class Command(BaseCommand):
+    help = 'Move delivered orders older than ORDER_ARCHIVE_AFTER_DAYS into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count archivable orders')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_orders(options['days']).count()
+            self.stdout.write(f'{count} orders would be archived')
+            return
+        archived = archive_delivered_orders(
+            older_than_days=options['days'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            progress=lambda done: self.stdout.write(f'archived {done} orders'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'{archived} orders archived'))
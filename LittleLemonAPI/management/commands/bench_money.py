@@ -0,0 +1,40 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.money import to_cents
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cart line and checkout total math: Decimal vs integer cents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=50, help='Cart lines per checkout')
+        parser.add_argument('--repeat', type=int, default=20000, help='Iterations per case')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        prices = [Decimal(rng.randint(199, 4999)).scaleb(-2) for _ in range(options['lines'])]
+        quantities = [rng.randint(1, 20) for _ in prices]
+
+        # Cart write: one line price per request
+        price, quantity = prices[0], quantities[0]
+        unit_cents = to_cents(price)
+        self.report('cart line (Decimal(str()))', repeat, lambda: Decimal(str(price)) * Decimal(str(quantity)))
+        self.report('cart line (to_cents on add)', repeat, lambda: to_cents(price) * quantity)
+        self.report('cart line (stored cents)', repeat, lambda: unit_cents * quantity)
+
+        # Checkout: sum of the stored line prices
+        decimal_lines = [p * q for p, q in zip(prices, quantities)]
+        cent_lines = [to_cents(p) * q for p, q in zip(prices, quantities)]
+        assert Decimal(sum(cent_lines)).scaleb(-2) == sum(decimal_lines)
+        self.report(f'checkout total, {len(prices)} lines (Decimal)', repeat, lambda: sum(decimal_lines))
+        self.report(f'checkout total, {len(prices)} lines (cents)', repeat, lambda: sum(cent_lines))
+
+    def report(self, label, repeat, func):
+        seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+        self.stdout.write(f'{label:<40} {seconds / repeat * 1e9:10.1f} ns/op')
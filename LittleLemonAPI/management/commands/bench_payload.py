@@ -0,0 +1,78 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI.middleware import CODECS, CompressionMiddleware
+from LittleLemonAPI.models import Order, OrderState
+from LittleLemonAPI.renderers import FastJSONRenderer
+from LittleLemonAPI.serializers import OrderSerializer
+
+
+def cpu_per_call(func, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = func()
+    return (time.process_time() - start) / repeat, result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bytes on the wire and CPU per response for an /orders/ payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--from-db', action='store_true', help='Serialize real orders instead of generated ones')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if options['from_db']:
+            orders = list(Order.objects.order_by('pk')[:rows])
+        else:
+            rng = random.Random(options['seed'])
+            today = date.today()
+            orders = [
+                Order(
+                    id=pk,
+                    user_id=rng.randint(1, 100000),
+                    delivery_crew_id=rng.choice([None, rng.randint(1, 2000)]),
+                    state=rng.choice(OrderState.values),
+                    total_cents=rng.randint(500, 250000),
+                    date=today - timedelta(days=rng.randint(0, 365)),
+                )
+                for pk in range(1, rows + 1)
+            ]
+        # Same shape as a paginated /orders/ response holding every row
+        payload = {
+            'count': len(orders),
+            'next': None,
+            'previous': None,
+            'results': OrderSerializer(orders, many=True).data,
+        }
+        self.stdout.write(f'/orders/ payload with {len(orders)} rows\n')
+
+        self.stdout.write(f'{"renderer":<20}{"bytes":>12}{"CPU us":>12}')
+        bodies = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            seconds, body = cpu_per_call(lambda: renderer.render(payload), repeat)
+            bodies[type(renderer).__name__] = body
+            self.stdout.write(f'{type(renderer).__name__:<20}{len(body):>12}{seconds * 1e6:>12.0f}')
+        if len(set(bodies.values())) > 1:
+            self.stdout.write(self.style.WARNING('Renderers produced different bytes'))
+
+        body = bodies['FastJSONRenderer']
+        factory = RequestFactory()
+        self.stdout.write(f'\n{"encoding":<20}{"bytes":>12}{"CPU us":>12}{"ratio":>8}')
+        for encoding in ['identity', *CODECS]:
+            request = factory.get('/api/orders/', HTTP_ACCEPT_ENCODING=encoding)
+            middleware = CompressionMiddleware(
+                lambda request: HttpResponse(body, content_type='application/json')
+            )
+            seconds, response = cpu_per_call(lambda: middleware(request), repeat)
+            size = len(response.content)
+            self.stdout.write(f'{encoding:<20}{size:>12}{seconds * 1e6:>12.0f}{len(body) / size:>8.1f}')
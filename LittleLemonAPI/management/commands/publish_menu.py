@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.snapshots import publish_menu_snapshots, snapshot_root
+
+
+class Command(BaseCommand):
+    help = 'Render the public menu into precompressed JSON snapshots and update the manifest'
+
+    def handle(self, *args, **options):
+        manifest = publish_menu_snapshots()
+        for name, snapshot in manifest['snapshots'].items():
+            encodings = ', '.join(sorted(snapshot['files']))
+            self.stdout.write(f'{name}: {snapshot["files"]["identity"]} ({snapshot["size"]} bytes; {encodings})')
+        self.stdout.write(self.style.SUCCESS(f'Manifest written to {snapshot_root() / "manifest.json"}'))
@@ -0,0 +1,280 @@
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from multiprocessing import Pool
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order, OrderItem, OrderState
+from LittleLemonAPI.money import from_cents
+
+
+# Rows are generated in fixed-size blocks, each with its own RNG, so the data
+# depends only on --seed and --as-of and not on --batch-size or --workers.
+BLOCK = 1000
+
+
+def block_rng(seed, kind, index):
+    # String seeds hash the same way in every process
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def blocks(total):
+    for index, start in enumerate(range(0, total, BLOCK)):
+        yield index, start, min(BLOCK, total - start)
+
+
+def batched(results, size):
+    # Group per-block results into insert batches of at least `size` rows
+    batch = []
+    for rows in results:
+        batch.append(rows)
+        if sum(len(r[0]) for r in batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Worker state, filled in by init_worker() so it is not pickled per block
+_plan = {}
+
+
+def init_worker(plan):
+    _plan.update(plan)
+
+
+def generate_orders(block):
+    """
+    Build one block of order and order item rows as plain tuples. Runs in a
+    worker process and never touches the database.
+    """
+    index, start, count = block
+    rng = block_rng(_plan['seed'], 'orders', index)
+    customers, crew = _plan['customers'], _plan['crew']
+    prices = _plan['prices']
+    menu_ids = list(prices)
+    as_of = _plan['as_of']
+    orders, items = [], []
+    for offset in range(count):
+        order_id = _plan['order_base'] + start + offset
+        age = int(rng.triangular(0, _plan['days'], 0))
+        # Older orders are almost always delivered, recent ones rarely
+        delivered = rng.random() < min(1.0, 0.05 + age / 7)
+        if delivered:
+            state = OrderState.DELIVERED
+        else:
+            state = rng.choice([OrderState.PLACED, OrderState.ASSIGNED, OrderState.OUT_FOR_DELIVERY])
+        if not crew:
+            state = OrderState.DELIVERED if delivered else OrderState.PLACED
+        assigned = state != OrderState.PLACED
+        total = 0
+        for menuitem_id in rng.sample(menu_ids, rng.randint(1, min(5, len(menu_ids)))):
+            quantity = rng.randint(1, 6)
+            unit_price = prices[menuitem_id]
+            total += unit_price * quantity
+            items.append((order_id, menuitem_id, quantity, unit_price, unit_price * quantity))
+        orders.append((
+            order_id,
+            rng.choice(customers),
+            rng.choice(crew) if assigned and crew else None,
+            state,
+            total,
+            as_of - timedelta(days=age),
+        ))
+    return orders, items
+
+
+@contextmanager
+def explicit_order_dates():
+    # bulk_create would otherwise stamp every seeded order with today's date
+    field = Order._meta.get_field('date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic, production-sized data for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=200000)
+        parser.add_argument('--managers', type=float, default=0.001, help='Fraction of users in Manager')
+        parser.add_argument('--crew', type=float, default=0.02, help='Fraction of users in Delivery Crew')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--menu-items', type=int, default=500)
+        parser.add_argument('--carts', type=int, default=50000, help='Number of customers with a non-empty cart')
+        parser.add_argument('--orders', type=int, default=2000000)
+        parser.add_argument('--days', type=int, default=730, help='Spread order dates over this many days')
+        parser.add_argument(
+            '--as-of', type=date.fromisoformat, default=None,
+            help='Date the data is generated relative to, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to generate order rows')
+        parser.add_argument('--prefix', default='scale', help='Username and slug prefix for generated rows')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.as_of = options['as_of'] or date.today()
+        # Same --seed and --as-of give the same rows on any day
+        self.log(f'as of {self.as_of.isoformat()} (pass --as-of to reproduce)')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users with prefix "{prefix}-" already exist; use another --prefix')
+
+        user_ids, managers, crew = self.seed_users(prefix)
+        customers = sorted(set(user_ids) - set(managers) - set(crew))
+        if not customers:
+            raise CommandError('No customers left after assigning groups')
+        prices = self.seed_menu(prefix)
+        self.seed_carts(customers, prices)
+        self.seed_orders(customers, crew, prices)
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def next_id(self, model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def seed_users(self, prefix):
+        total = self.options['users']
+        base = self.next_id(User)
+        password = make_password('littlelemon', salt=f'seed{self.seed}')
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        crew_group, _ = Group.objects.get_or_create(name='Delivery Crew')
+        Membership = User.groups.through
+        # Midnight keeps date_joined independent of the time of the run
+        midnight = datetime.combine(self.as_of, time(), tzinfo=timezone.utc)
+        managers, crew = [], []
+        users, memberships = [], []
+        for index, start, count in blocks(total):
+            rng = block_rng(self.seed, 'users', index)
+            for offset in range(count):
+                user_id = base + start + offset
+                username = f'{prefix}-{start + offset}'
+                users.append(User(
+                    id=user_id,
+                    username=username,
+                    email=f'{username}@example.com',
+                    password=password,
+                    date_joined=midnight - timedelta(days=rng.randint(0, self.options['days'])),
+                ))
+                roll = rng.random()
+                if roll < self.options['managers']:
+                    managers.append(user_id)
+                    memberships.append(Membership(user_id=user_id, group_id=manager_group.pk))
+                elif roll < self.options['managers'] + self.options['crew']:
+                    crew.append(user_id)
+                    memberships.append(Membership(user_id=user_id, group_id=crew_group.pk))
+            if len(users) >= self.batch_size or start + count == total:
+                with transaction.atomic():
+                    User.objects.bulk_create(users)
+                    Membership.objects.bulk_create(memberships)
+                users, memberships = [], []
+        self.log(f'users: {total} ({len(managers)} managers, {len(crew)} delivery crew)')
+        return range(base, base + total), managers, crew
+
+    def seed_menu(self, prefix):
+        rng = block_rng(self.seed, 'menu', 0)
+        category_base = self.next_id(Category)
+        categories = [
+            Category(id=category_base + n, slug=f'{prefix}-{n}', title=f'Category {n}')
+            for n in range(self.options['categories'])
+        ]
+        item_base = self.next_id(MenuItem)
+        prices = {}
+        items = []
+        for n in range(self.options['menu_items']):
+            prices[item_base + n] = rng.randint(199, 4999)
+            items.append(MenuItem(
+                id=item_base + n,
+                title=f'Dish {n}',
+                price=from_cents(prices[item_base + n]),
+                featured=rng.random() < 0.05,
+                category_id=categories[n % len(categories)].pk,
+            ))
+        with transaction.atomic():
+            Category.objects.bulk_create(categories)
+            MenuItem.objects.bulk_create(items, batch_size=self.batch_size)
+        self.log(f'categories: {len(categories)}, menu items: {len(items)}')
+        return prices
+
+    def seed_carts(self, customers, prices):
+        total = min(self.options['carts'], len(customers))
+        owners = block_rng(self.seed, 'cart-owners', 0).sample(customers, total)
+        menu_ids = list(prices)
+        rows = 0
+        carts = []
+        for index, start, count in blocks(total):
+            rng = block_rng(self.seed, 'carts', index)
+            for user_id in owners[start:start + count]:
+                for menuitem_id in rng.sample(menu_ids, rng.randint(1, min(3, len(menu_ids)))):
+                    quantity = rng.randint(1, 4)
+                    carts.append(Cart(
+                        user_id=user_id,
+                        menuitem_id=menuitem_id,
+                        quantity=quantity,
+                        unit_price_cents=prices[menuitem_id],
+                        price_cents=prices[menuitem_id] * quantity,
+                    ))
+            if len(carts) >= self.batch_size or start + count == total:
+                Cart.objects.bulk_create(carts)
+                rows += len(carts)
+                carts = []
+        self.log(f'carts: {total} users, {rows} lines')
+
+    def seed_orders(self, customers, crew, prices):
+        total = self.options['orders']
+        plan = {
+            'seed': self.seed,
+            'customers': customers,
+            'crew': crew,
+            'prices': prices,
+            'order_base': self.next_id(Order),
+            'days': self.options['days'],
+            'as_of': self.as_of,
+        }
+        work = blocks(total)
+        workers = self.options['workers']
+        pool = Pool(workers, initializer=init_worker, initargs=(plan,)) if workers > 1 else None
+        if pool is None:
+            init_worker(plan)
+            batches = map(generate_orders, work)
+        else:
+            # imap keeps block order, so inserts stay deterministic
+            batches = pool.imap(generate_orders, work)
+        done = items_done = 0
+        try:
+            with explicit_order_dates():
+                for batch in batched(batches, self.batch_size):
+                    orders = [row for block_orders, _ in batch for row in block_orders]
+                    items = [row for _, block_items in batch for row in block_items]
+                    with transaction.atomic():
+                        Order.objects.bulk_create([
+                            Order(id=pk, user_id=user_id, delivery_crew_id=crew_id,
+                                  state=state, total_cents=total_cents, date=day)
+                            for pk, user_id, crew_id, state, total_cents, day in orders
+                        ])
+                        OrderItem.objects.bulk_create([
+                            OrderItem(order_id=order_id, menuitem_id=menuitem_id, quantity=quantity,
+                                      unit_price_cents=unit_price_cents, price_cents=price_cents)
+                            for order_id, menuitem_id, quantity, unit_price_cents, price_cents in items
+                        ], batch_size=self.batch_size)
+                    done += len(orders)
+                    items_done += len(items)
+                    self.log(f'orders: {done}/{total}')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.log(f'orders: {done}, order items: {items_done}')
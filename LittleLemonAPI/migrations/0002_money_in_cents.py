@@ -0,0 +1,116 @@
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+
+MONEY_FIELDS = [
+    ('Cart', ['unit_price', 'price']),
+    ('OrderItem', ['unit_price', 'price']),
+    ('Order', ['total']),
+]
+
+
+def decimals_to_cents(apps, schema_editor):
+    for model_name, fields in MONEY_FIELDS:
+        model = apps.get_model('LittleLemonAPI', model_name)
+        model.objects.update(**{
+            f'{field}_cents': Cast(Round(F(field) * Value(100)), models.BigIntegerField())
+            for field in fields
+        })
+
+
+def cents_to_decimals(apps, schema_editor):
+    for model_name, fields in MONEY_FIELDS:
+        model = apps.get_model('LittleLemonAPI', model_name)
+        model.objects.update(**{
+            field: Cast(F(f'{field}_cents'), models.FloatField()) / Value(100.0)
+            for field in fields
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='unit_price_cents',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='price_cents',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price_cents',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='price_cents',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cents',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        # Old columns are made nullable first so the reverse migration can
+        # re-add them before copying the cents back.
+        migrations.AlterField(
+            model_name='cart',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.RunPython(decimals_to_cents, cents_to_decimals),
+        migrations.RemoveField(
+            model_name='cart',
+            name='unit_price',
+        ),
+        migrations.RemoveField(
+            model_name='cart',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='unit_price',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='total',
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def status_to_state(apps, schema_editor):
+    # Delivered orders map directly; undelivered ones with a crew are assigned
+    for model_name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('LittleLemonAPI', model_name)
+        model.objects.filter(status=True).update(state='delivered')
+        model.objects.filter(status=False, delivery_crew__isnull=False).update(state='assigned')
+        model.objects.filter(status=False, delivery_crew__isnull=True).update(state='placed')
+
+
+def state_to_status(apps, schema_editor):
+    for model_name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('LittleLemonAPI', model_name)
+        model.objects.update(status=Q(state='delivered'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0003_order_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='state',
+            field=models.CharField(choices=[('placed', 'Placed'), ('assigned', 'Assigned'), ('out_for_delivery', 'Out For Delivery'), ('delivered', 'Delivered')], default='placed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='state',
+            field=models.CharField(choices=[('placed', 'Placed'), ('assigned', 'Assigned'), ('out_for_delivery', 'Out For Delivery'), ('delivered', 'Delivered')], default='placed', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+            preserve_default=False,
+        ),
+        migrations.RunPython(status_to_state, state_to_status),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='LittleLemon_status_80a912_idx',
+        ),
+        migrations.RemoveField(
+            model_name='archivedorder',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='status',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['state', 'date'], name='LittleLemon_state_36978a_idx'),
+        ),
+        migrations.CreateModel(
+            name='OrderTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_state', models.CharField(choices=[('placed', 'Placed'), ('assigned', 'Assigned'), ('out_for_delivery', 'Out For Delivery'), ('delivered', 'Delivered')], max_length=20)),
+                ('to_state', models.CharField(choices=[('placed', 'Placed'), ('assigned', 'Assigned'), ('out_for_delivery', 'Out For Delivery'), ('delivered', 'Delivered')], max_length=20)),
+                ('version', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_transitions', to=settings.AUTH_USER_MODEL)),
+                ('delivery_crew', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transitions', to='LittleLemonAPI.order')),
+            ],
+            options={
+                'unique_together': {('order', 'version')},
+            },
+        ),
+    ]
@@ -24,12 +24,26 @@ class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
-    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
-    price = models.DecimalField(max_digits=6, decimal_places=2)
+    unit_price_cents = models.BigIntegerField()
+    price_cents = models.BigIntegerField()
 
     class Meta:
         unique_together = ('user', 'menuitem')
 
+class OrderState(models.TextChoices):
+    PLACED = 'placed'
+    ASSIGNED = 'assigned'
+    OUT_FOR_DELIVERY = 'out_for_delivery'
+    DELIVERED = 'delivered'
+
+# Allowed moves; assigned -> assigned is a reassignment to another crew member
+ORDER_TRANSITIONS = {
+    OrderState.PLACED: {OrderState.ASSIGNED},
+    OrderState.ASSIGNED: {OrderState.ASSIGNED, OrderState.OUT_FOR_DELIVERY},
+    OrderState.OUT_FOR_DELIVERY: {OrderState.DELIVERED},
+    OrderState.DELIVERED: set(),
+}
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(
@@ -38,16 +52,77 @@ class Order(models.Model):
         related_name="delivery_crew",
         null=True
     )
-    status = models.BooleanField(default=0)
-    total = models.DecimalField(max_digits=6, decimal_places=2)
+    # Only changed through lifecycle.transition_order(), which bumps version
+    state = models.CharField(max_length=20, choices=OrderState.choices, default=OrderState.PLACED)
+    version = models.PositiveIntegerField(default=1)
+    total_cents = models.BigIntegerField()
     date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Archival scans for old delivered orders
+            models.Index(fields=['state', 'date']),
+        ]
+
+    @property
+    def delivered(self):
+        return self.state == OrderState.DELIVERED
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
-    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
-    price = models.DecimalField(max_digits=6, decimal_places=2)
+    unit_price_cents = models.BigIntegerField()
+    price_cents = models.BigIntegerField()
 
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class OrderTransition(models.Model):
+    # No FK constraint: history outlives the live row when orders are archived
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="transitions"
+    )
+    from_state = models.CharField(max_length=20, choices=OrderState.choices)
+    to_state = models.CharField(max_length=20, choices=OrderState.choices)
+    version = models.PositiveIntegerField()
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="+", null=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="order_transitions", null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # At most one transition can produce each version of an order
+        unique_together = ('order', 'version')
+
+# Delivered orders past ORDER_ARCHIVE_AFTER_DAYS are moved here by
+# archive.archive_delivered_orders() so the live tables stay small. Rows keep
+# their original primary keys.
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders")
+    delivery_crew = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="archived_deliveries",
+        null=True
+    )
+    state = models.CharField(max_length=20, choices=OrderState.choices)
+    version = models.PositiveIntegerField()
+    total_cents = models.BigIntegerField()
+    date = models.DateField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def delivered(self):
+        return self.state == OrderState.DELIVERED
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.SmallIntegerField()
+    unit_price_cents = models.BigIntegerField()
+    price_cents = models.BigIntegerField()
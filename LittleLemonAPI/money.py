@@ -0,0 +1,12 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Cart, Order and OrderItem store money as integer minor units (cents) so the
+# cart and checkout paths only ever do integer arithmetic.
+def to_cents(amount):
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int((amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
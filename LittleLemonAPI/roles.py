@@ -0,0 +1,38 @@
+from django.contrib.auth.models import Group
+
+
+# URL slugs for the groups the API manages
+GROUP_SLUGS = {
+    'manager': 'Manager',
+    'delivery-crew': 'Delivery Crew',
+}
+
+
+def user_roles(user):
+    """
+    Names of the user's groups, read once per request and kept on the user
+    object, like ModelBackend keeps permissions. Nothing outlives the
+    request, so a membership change applies to the next request in every
+    worker.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    if not hasattr(user, '_roles_cache'):
+        user._roles_cache = frozenset(user.groups.values_list('name', flat=True))
+    return user._roles_cache
+
+
+def has_role(user, name):
+    return name in user_roles(user)
+
+
+def can_change_group(user, name):
+    # Same rules as the single-user group views: managers manage the
+    # Manager group, only admins manage the delivery crew
+    if name == 'Manager':
+        return has_role(user, 'Manager')
+    return user.is_staff
+
+
+def group_id(name):
+    return Group.objects.filter(name=name).values_list('pk', flat=True).first()
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+
+# Alias the current request is allowed to read from, or None for 'default'
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', 'replica')
+    if alias in settings.DATABASES:
+        return alias
+    return None
+
+
+# Signed cookie holding the id of a user who just wrote; it travels with the
+# client, so every worker sees the pin, not just the one that took the write.
+# Only session (browser) clients are relied on to send it back; token clients
+# usually drop cookies, see ReplicaReadMixin.reads_own_writes.
+PIN_COOKIE = 'replica_pin'
+
+
+def carries_pin(request):
+    return isinstance(request.successful_authenticator, SessionAuthentication)
+
+
+def pin_to_primary(request, response):
+    # Keep the user's reads on the primary until the replica has caught up
+    seconds = getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 5)
+    if request.user.is_authenticated and seconds and carries_pin(request):
+        response.set_signed_cookie(
+            PIN_COOKIE, str(request.user.pk), salt=PIN_COOKIE,
+            max_age=seconds, httponly=True, samesite='Lax'
+        )
+
+
+def is_pinned(request):
+    seconds = getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 5)
+    if not (request.user.is_authenticated and seconds and carries_pin(request)):
+        return False
+    # max_age is checked against the signed timestamp, not the cookie expiry
+    pinned = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=seconds)
+    return pinned == str(request.user.pk)
+
+
+@contextmanager
+def use_replica():
+    token = _read_alias.set(replica_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica only while a view has opted in via use_replica()
+    or ReplicaReadMixin; everything else, and every write, uses 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from the read replica unless the user recently wrote
+    to their cart or orders.
+
+    Views that list the user's own writes set reads_own_writes; there,
+    authenticated clients that cannot carry the pin cookie (token auth)
+    always read from the primary.
+    """
+    reads_own_writes = False
+
+    def use_replica_for(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        if self.reads_own_writes and request.user.is_authenticated and not carries_pin(request):
+            return False
+        return not is_pinned(request)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replica_for(request):
+            self._read_alias_token = _read_alias.set(replica_alias())
+
+    def dispatch(self, request, *args, **kwargs):
+        # Reset even when the view raises, or the thread's next request
+        # would still read from the replica
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            token = getattr(self, '_read_alias_token', None)
+            if token is not None:
+                _read_alias.reset(token)
+                self._read_alias_token = None
+
+
+class StickyWriteMixin:
+    """
+    Pin the user to the primary after a successful cart or order write so
+    their next reads see it (read-your-writes). The pin is only set for
+    session clients, which send cookies back.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request, response)
+        return response
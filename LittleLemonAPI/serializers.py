@@ -1,9 +1,30 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, Order, OrderItem, ArchivedOrder
+from .money import from_cents, to_cents
+
+class MoneyField(serializers.DecimalField):
+    # Renders integer cents from the model as the API's usual decimal amount
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_digits', 14)
+        kwargs.setdefault('decimal_places', 2)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return super().to_representation(from_cents(value))
+
+    def to_internal_value(self, data):
+        return to_cents(super().to_internal_value(data))
 
 class UserGroupSerializer(serializers.Serializer):
     username = serializers.CharField()
+
+class UsernameListSerializer(serializers.Serializer):
+    usernames = serializers.ListField(
+        child=serializers.CharField(max_length=150),
+        allow_empty=False,
+        max_length=1000
+    )
     
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,13 +33,12 @@ class UserSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     quantity = serializers.IntegerField(min_value=1)
-    unit_price = serializers.DecimalField(max_digits=6, decimal_places=2, read_only=True)
-    price = serializers.DecimalField(max_digits=6, decimal_places=2, read_only=True)
+    unit_price = MoneyField(source='unit_price_cents', read_only=True)
+    price = MoneyField(source='price_cents', read_only=True)
     
     class Meta:
         model = Cart
         fields = ['id', 'menuitem', 'unit_price', 'quantity', 'price']
-        read_only_fields = ['unit_price', 'price']
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,38 +56,57 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
 
 class CartSerializer(serializers.ModelSerializer):
+    unit_price = MoneyField(source='unit_price_cents', read_only=True)
+    price = MoneyField(source='price_cents', read_only=True)
+
     class Meta:
         model = Cart
         fields = ['user', 'menuitem', 'quantity', 'unit_price', 'price']
         extra_kwargs = {
-            'price': {'read_only': True},
-            'unit_price': {'read_only': True},
             'user': {'read_only': True}
         }
 
 class OrderSerializer(serializers.ModelSerializer):
+    total = MoneyField(source='total_cents', read_only=True)
+    status = serializers.BooleanField(source='delivered', read_only=True)
+
     class Meta:
         model = Order
-        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
-        read_only_fields = ['user', 'total', 'date']
+        fields = ['id', 'user', 'delivery_crew', 'state', 'status', 'version', 'total', 'date']
+        read_only_fields = ['user', 'state', 'version', 'date']
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    unit_price = MoneyField(source='unit_price_cents', read_only=True)
+    price = MoneyField(source='price_cents', read_only=True)
+
     class Meta:
         model = OrderItem
         fields = ['order', 'menuitem', 'quantity', 'unit_price', 'price']
 
 class OrderSerializer(serializers.ModelSerializer):
     orderitem_set = OrderItemSerializer(many=True, read_only=True)
+    total = MoneyField(source='total_cents', read_only=True)
+    status = serializers.BooleanField(source='delivered', read_only=True)
     
     class Meta:
         model = Order
-        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'orderitem_set']
-        extra_kwargs = {
-            'total': {'read_only': True}
-        }
+        fields = ['id', 'user', 'delivery_crew', 'state', 'status', 'version', 'total', 'date', 'orderitem_set']
+        read_only_fields = ['state', 'version']
         
 class OrderSerializer(serializers.ModelSerializer):
+    total = MoneyField(source='total_cents', read_only=True)
+    status = serializers.BooleanField(source='delivered', read_only=True)
+
     class Meta:
         model = Order
-        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
-        read_only_fields = ['user', 'total', 'date']
\ No newline at end of file
+        fields = ['id', 'user', 'delivery_crew', 'state', 'status', 'version', 'total', 'date']
+        read_only_fields = ['user', 'state', 'version', 'date']
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    total = MoneyField(source='total_cents', read_only=True)
+    status = serializers.BooleanField(source='delivered', read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'user', 'delivery_crew', 'state', 'status', 'version', 'total', 'date', 'archived_at']
+        read_only_fields = fields
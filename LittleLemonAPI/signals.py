@@ -0,0 +1,43 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, MenuItem
+from .snapshots import publish_menu_snapshots
+
+
+logger = logging.getLogger(__name__)
+
+
+def publish_after_commit():
+    # The catalog write is already committed by now; a failed publish must
+    # not turn it into an error response the client would retry
+    try:
+        publish_menu_snapshots()
+    except Exception:
+        logger.exception('Publishing menu snapshots failed')
+
+
+def publish_pending(connection):
+    """
+    Whether the current transaction already has a publish queued. Reads
+    the connection's (savepoint ids, callback, robust) on_commit entries
+    rather than keeping a flag, because Django drops entries when their
+    savepoint rolls back and a flag would not follow.
+    """
+    return any(func is publish_after_commit for _, func, _ in connection.run_on_commit)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, raw=False, **kwargs):
+    # Fixtures are loaded raw; run 'manage.py publish_menu' after loaddata
+    if raw or not settings.MENU_SNAPSHOT_AUTOPUBLISH:
+        return
+    # One publish per transaction, however many catalog rows it writes
+    if publish_pending(transaction.get_connection()):
+        return
+    transaction.on_commit(publish_after_commit)
@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Category, MenuItem
+from .serializers import CategorySerializer, MenuItemSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+MANIFEST = 'manifest.json'
+
+
+def snapshot_root():
+    return Path(settings.MENU_SNAPSHOT_ROOT)
+
+
+def render_menu():
+    """
+    Build every public menu document as rendered JSON bytes: the complete
+    menu, the category list and one document per category. Items are in
+    the same order as the menu-items list endpoint.
+    """
+    renderer = JSONRenderer()
+    categories = list(Category.objects.order_by('pk'))
+    items = list(MenuItem.objects.select_related('category').order_by('price', 'pk'))
+    category_data = CategorySerializer(categories, many=True).data
+    item_data = MenuItemSerializer(items, many=True).data
+
+    documents = {
+        'menu': renderer.render({'categories': category_data, 'menu_items': item_data}),
+        'categories': renderer.render(category_data),
+    }
+    for category in category_data:
+        documents[f'category-{category["id"]}'] = renderer.render({
+            'category': category,
+            'menu_items': [item for item in item_data if item['category']['id'] == category['id']],
+        })
+    return documents
+
+
+def write_atomic(path, content):
+    # Write next to the target and rename, so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_snapshot(root, name, content):
+    digest = hashlib.sha256(content).hexdigest()
+    filename = f'{name}.{digest[:16]}.json'
+    variants = {'identity': (filename, content)}
+    # mtime=0 keeps the gzip bytes identical for identical content
+    variants['gzip'] = (f'{filename}.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        variants['br'] = (f'{filename}.br', brotli.compress(content, quality=11))
+    for variant_name, data in variants.values():
+        # Content-addressed: an existing file already has these bytes
+        if not (root / variant_name).exists():
+            write_atomic(root / variant_name, data)
+    return {
+        'sha256': digest,
+        'size': len(content),
+        'files': {encoding: variant_name for encoding, (variant_name, _) in variants.items()},
+    }
+
+
+def read_manifest(root):
+    try:
+        return json.loads((root / MANIFEST).read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def manifest_files(manifest):
+    if not manifest:
+        return set()
+    return {
+        filename
+        for snapshot in manifest['snapshots'].values()
+        for filename in snapshot['files'].values()
+    }
+
+
+@contextmanager
+def publish_lock(root):
+    if fcntl is None:
+        yield
+        return
+    with open(root / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def publish_menu_snapshots():
+    """
+    Render the menu and publish it under MENU_SNAPSHOT_ROOT: content-hashed
+    JSON files with .gz (and .br when brotli is installed) siblings, then
+    manifest.json pointing at them, swapped in atomically. Files from the
+    previous manifest are kept for readers still using it; older ones are
+    removed. Returns the new manifest.
+    """
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+    with publish_lock(root):
+        # Render under the lock: a publish that rendered earlier must not
+        # write its older menu over a newer one
+        documents = render_menu()
+        previous = read_manifest(root)
+        manifest = {
+            'generated_at': timezone.now().isoformat(),
+            'snapshots': {
+                name: write_snapshot(root, name, content)
+                for name, content in documents.items()
+            },
+        }
+        write_atomic(root / MANIFEST, json.dumps(manifest, indent=2).encode())
+
+        keep = manifest_files(manifest) | manifest_files(previous)
+        for path in root.glob('*.json*'):
+            if path.name != MANIFEST and path.name not in keep:
+                path.unlink()
+    return manifest
@@ -1,3 +1,1078 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from unittest import mock
+from contextlib import ExitStack, contextmanager
+from io import StringIO
+from pathlib import Path
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import snapshots, urls, views
+from .archive import archivable_orders, archive_batch, archive_delivered_orders
+from .lifecycle import OrderConflict, transition_order
+from .middleware import CompressionMiddleware, negotiate_encoding
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, Category, MenuItem, Order, OrderItem, OrderState, OrderTransition
+from .renderers import FastJSONRenderer
+from .routers import PIN_COOKIE, _read_alias
+from .signals import publish_after_commit, publish_pending
+from .snapshots import publish_menu_snapshots, read_manifest
+from .throttling import CacheBucketStore, LocalBucketStore, reset_throttles
+
+
+def retry_locked(func, *args, timeout=10, **kwargs):
+    # SQLite's shared-cache test database refuses concurrent statements with
+    # "table is locked" instead of waiting; a refused statement changed
+    # nothing, so it is safe to run it again. Any other error, or a lock
+    # that lasts longer than `timeout` seconds, is raised.
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or time.monotonic() >= deadline:
+                raise
+            time.sleep(0.001)
+
+
+class RetryLockedTest(SimpleTestCase):
+
+    def test_retries_lock_errors_until_they_clear(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError('database table is locked')
+            return 'done'
+
+        self.assertEqual(retry_locked(flaky), 'done')
+        self.assertEqual(len(attempts), 3)
+
+    def test_other_errors_are_raised_at_once(self):
+        attempts = []
+
+        def broken():
+            attempts.append(1)
+            raise OperationalError('no such table: LittleLemonAPI_order')
+
+        with self.assertRaises(OperationalError):
+            retry_locked(broken)
+        self.assertEqual(len(attempts), 1)
+
+    def test_gives_up_after_timeout(self):
+        def locked():
+            raise OperationalError('database table is locked')
+
+        with self.assertRaises(OperationalError):
+            retry_locked(locked, timeout=0.05)
+
+
+class OrderTransitionStressTest(TransactionTestCase):
+    threads = 8
+    rounds = 20
+
+    def setUp(self):
+        cache.clear()
+        customer = User.objects.create_user('customer')
+        self.crew = [User.objects.create_user(f'crew{n}') for n in range(self.threads)]
+        self.order = Order.objects.create(
+            user=customer,
+            total_cents=1000,
+            state=OrderState.ASSIGNED,
+            delivery_crew=self.crew[0]
+        )
+
+    def test_concurrent_reassignments_lose_no_updates(self):
+        # Each round every thread reads the order, waits for the others to
+        # read the same version, then tries to reassign it to itself
+        barrier = threading.Barrier(self.threads, timeout=30)
+        applied = [[] for _ in range(self.threads)]
+        conflicts = [0] * self.threads
+        errors = []
+
+        def reassign(n):
+            try:
+                for _ in range(self.rounds):
+                    barrier.wait()
+                    order = retry_locked(Order.objects.get, pk=self.order.pk)
+                    barrier.wait()
+                    try:
+                        retry_locked(
+                            transition_order, order, OrderState.ASSIGNED, None,
+                            delivery_crew=self.crew[n]
+                        )
+                    except OrderConflict:
+                        conflicts[n] += 1
+                    else:
+                        applied[n].append(order.version)
+            except Exception as exc:
+                errors.append(exc)
+                barrier.abort()
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=reassign, args=(n,)) for n in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        # Exactly one writer wins each round; everyone else gets a conflict
+        versions = sorted(v for thread_versions in applied for v in thread_versions)
+        self.assertEqual(versions, list(range(2, 2 + self.rounds)))
+        self.assertEqual(sum(conflicts), self.rounds * (self.threads - 1))
+
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual(order.version, 1 + self.rounds)
+        history = list(OrderTransition.objects.filter(order=order).order_by('version'))
+        self.assertEqual([t.version for t in history], versions)
+        # The row holds exactly what the last recorded transition wrote
+        winner = next(n for n in range(self.threads) if order.version in applied[n])
+        self.assertEqual(order.delivery_crew_id, self.crew[winner].pk)
+        self.assertEqual(history[-1].delivery_crew_id, self.crew[winner].pk)
+
+
+class OrderLifecycleApiTest(TestCase):
+
+    def setUp(self):
+        # Role and throttle state would otherwise leak between tests
+        cache.clear()
+        reset_throttles()
+        self.manager = User.objects.create_user('manager')
+        self.driver = User.objects.create_user('driver')
+        self.customer = User.objects.create_user('customer')
+        Group.objects.create(name='Manager').user_set.add(self.manager)
+        Group.objects.create(name='Delivery Crew').user_set.add(self.driver)
+        self.order = Order.objects.create(user=self.customer, total_cents=1250)
+        self.client = APIClient()
+
+    def patch(self, user, data):
+        self.client.force_authenticate(user)
+        return self.client.patch(f'/api/orders/{self.order.pk}/', data, format='json')
+
+    def test_full_lifecycle_is_recorded(self):
+        response = self.patch(self.manager, {'delivery_crew': 'driver', 'version': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['state'], 'assigned')
+        self.patch(self.driver, {'state': 'out_for_delivery', 'version': 2})
+        response = self.patch(self.driver, {'state': 'delivered', 'version': 3})
+        self.assertEqual(response.data['state'], 'delivered')
+        self.assertTrue(response.data['status'])
+        self.assertEqual(
+            list(OrderTransition.objects.values_list('to_state', flat=True).order_by('version')),
+            ['assigned', 'out_for_delivery', 'delivered']
+        )
+
+    def test_stale_version_conflicts(self):
+        self.patch(self.manager, {'delivery_crew': 'driver', 'version': 1})
+        response = self.patch(self.manager, {'delivery_crew': 'manager', 'version': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).delivery_crew, self.driver)
+
+    def test_invalid_transition_is_rejected(self):
+        response = self.patch(self.manager, {'state': 'delivered'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).version, 1)
+
+    def test_customer_cannot_change_state(self):
+        response = self.patch(self.customer, {'state': 'delivered'})
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MENU_SNAPSHOT_AUTOPUBLISH=False)
+class ReplicaRoutingTest(TransactionTestCase):
+    # '__all__' is resolved in setUpClass, after 'replica' has been added
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        # Without LITTLELEMON_REPLICA_DB there is no 'replica' alias; add one
+        # that mirrors the test database, as settings.py configures it
+        cls.added_replica = 'replica' not in connections
+        if cls.added_replica:
+            default = connections['default'].settings_dict
+            connections.settings['replica'] = {**default, 'TEST': {**default['TEST'], 'MIRROR': 'default'}}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.added_replica:
+            connections['replica'].close()
+            del connections['replica']
+            del connections.settings['replica']
+
+    def setUp(self):
+        reset_throttles()
+        category = Category.objects.create(slug='mains', title='Mains')
+        self.item = MenuItem.objects.create(title='Pasta', price='9.50', featured=False, category=category)
+        self.customer = User.objects.create_user('customer')
+        # A browser: session auth, sends cookies back
+        self.client = APIClient()
+        self.client.force_login(self.customer)
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        return client
+
+    def aliases_used(self, client, path):
+        # Which connections served the request: {'default': n, 'replica': n}
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return {'default': len(primary), 'replica': len(replica)}
+
+    def test_safe_get_reads_from_replica(self):
+        used = self.aliases_used(APIClient(), '/api/menu-items/')
+        self.assertGreater(used['replica'], 0)
+        self.assertEqual(used['default'], 0)
+
+    def test_get_after_write_reads_from_primary(self):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.item.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        used = self.aliases_used(self.client, '/api/orders/')
+        self.assertEqual(used['replica'], 0)
+        self.assertGreater(used['default'], 0)
+
+    def test_pin_applies_only_to_the_writer(self):
+        self.client.post('/api/cart/menu-items/', {'menuitem': self.item.pk, 'quantity': 1}, format='json')
+        # Another user presenting the writer's cookie is not pinned
+        other = APIClient()
+        other.force_login(User.objects.create_user('other'))
+        other.cookies[PIN_COOKIE] = self.client.cookies[PIN_COOKIE].value
+        self.assertGreater(self.aliases_used(other, '/api/orders/')['replica'], 0)
+
+    def test_forged_pin_is_ignored(self):
+        self.client.cookies[PIN_COOKIE] = str(self.customer.pk)
+        self.assertGreater(self.aliases_used(self.client, '/api/orders/')['replica'], 0)
+
+    def test_token_client_reads_own_orders_from_primary(self):
+        client = self.token_client(self.customer)
+        response = client.post('/api/cart/menu-items/', {'menuitem': self.item.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = client.post('/api/orders/', format='json')
+        self.assertEqual(response.status_code, 201)
+        # Token clients don't keep cookies
+        client.cookies.clear()
+
+        used = self.aliases_used(client, '/api/orders/')
+        self.assertEqual(used['replica'], 0)
+        self.assertGreater(used['default'], 0)
+
+    def test_token_client_reads_menu_from_replica(self):
+        # The token lookup itself runs on 'default', before the view picks
+        used = self.aliases_used(self.token_client(self.customer), '/api/menu-items/')
+        self.assertGreater(used['replica'], 0)
+        self.assertEqual(used['default'], 1)
+
+    def test_view_error_does_not_leave_reads_on_replica(self):
+        with mock.patch.object(views.MenuItemViewSet, 'list', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                APIClient().get('/api/menu-items/')
+        self.assertIsNone(_read_alias.get())
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': 0, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class SeedScaleDeterminismTest(TestCase):
+    options = {
+        'seed': 7, 'as_of': '2025-06-30', 'users': 60, 'categories': 3, 'menu_items': 12,
+        'carts': 10, 'orders': 2500, 'days': 120, 'batch_size': 700,
+    }
+
+    def seed(self, **options):
+        # Seed inside a savepoint and roll it back, so every run starts from
+        # the same empty tables and gets the same ids
+        with transaction.atomic():
+            call_command('seed_scale', *[
+                f'--{name.replace("_", "-")}={value}' for name, value in {**self.options, **options}.items()
+            ], stdout=StringIO())
+            rows = {
+                'users': list(User.objects.order_by('pk').values_list('pk', 'username', 'date_joined')),
+                'groups': list(User.groups.through.objects.order_by('user_id').values_list('user_id', 'group__name')),
+                'menu': list(MenuItem.objects.order_by('pk').values_list('pk', 'price', 'featured', 'category_id')),
+                'carts': list(Cart.objects.order_by('pk').values_list('user_id', 'menuitem_id', 'quantity', 'price_cents')),
+                'orders': list(Order.objects.order_by('pk').values_list(
+                    'pk', 'user_id', 'delivery_crew_id', 'state', 'total_cents', 'date'
+                )),
+                'items': list(OrderItem.objects.order_by('pk').values_list('order_id', 'menuitem_id', 'quantity', 'price_cents')),
+            }
+            transaction.set_rollback(True)
+        return rows
+
+    def test_same_arguments_give_same_rows(self):
+        serial = self.seed(workers=1)
+        # Orders span several RNG blocks and insert batches
+        self.assertEqual(len(serial['orders']), 2500)
+        self.assertEqual(self.seed(workers=2), serial)
+        self.assertEqual(self.seed(workers=2, batch_size=100), serial)
+        self.assertEqual(max(day for *_, day in serial['orders']), date(2025, 6, 30))
+
+    def test_as_of_moves_dates_only(self):
+        serial = self.seed()
+        later = self.seed(as_of='2025-07-01')
+        self.assertEqual(
+            [row[:-1] for row in later['orders']],
+            [row[:-1] for row in serial['orders']]
+        )
+        self.assertNotEqual(later['orders'], serial['orders'])
+
+
+# Reads stay on 'default', the only database a TestCase wraps
+@override_settings(READ_REPLICA_ALIAS=None)
+class OrderArchiveTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_throttles()
+        self.customer = User.objects.create_user('customer')
+        category = Category.objects.create(slug='mains', title='Mains')
+        self.items = [
+            MenuItem.objects.create(title=f'Dish {n}', price='9.50', featured=False, category=category)
+            for n in range(3)
+        ]
+
+    def order(self, days_ago, state=OrderState.DELIVERED, items=2):
+        order = Order.objects.create(user=self.customer, state=state, total_cents=950 * items)
+        # date is auto_now_add, so backdate it afterwards
+        Order.objects.filter(pk=order.pk).update(date=date.today() - timedelta(days=days_ago))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price_cents=950, price_cents=950)
+            for item in self.items[:items]
+        )
+        return order.pk
+
+    def test_only_old_delivered_orders_are_archived(self):
+        old = self.order(91)
+        boundary = self.order(90)
+        recent = self.order(10)
+        undelivered = self.order(200, state=OrderState.OUT_FOR_DELIVERY)
+
+        self.assertEqual(archive_delivered_orders(older_than_days=90), 1)
+        self.assertEqual(list(ArchivedOrder.objects.values_list('pk', flat=True)), [old])
+        self.assertEqual(
+            sorted(Order.objects.values_list('pk', flat=True)),
+            sorted([boundary, recent, undelivered])
+        )
+
+    def test_items_move_with_their_orders(self):
+        order_id = self.order(120, items=3)
+        item_ids = sorted(OrderItem.objects.filter(order_id=order_id).values_list('pk', flat=True))
+        archive_delivered_orders(older_than_days=90)
+
+        self.assertFalse(OrderItem.objects.filter(order_id=order_id).exists())
+        archived = ArchivedOrder.objects.get(pk=order_id)
+        self.assertEqual((archived.state, archived.total_cents), (OrderState.DELIVERED, 2850))
+        self.assertEqual(
+            sorted(ArchivedOrderItem.objects.filter(order_id=order_id).values_list('pk', flat=True)),
+            item_ids
+        )
+
+    def test_archives_in_batches(self):
+        ids = [self.order(100) for _ in range(5)]
+        progress = []
+        self.assertEqual(archive_delivered_orders(older_than_days=90, batch_size=2, progress=progress.append), 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(sorted(ArchivedOrder.objects.values_list('pk', flat=True)), ids)
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_changed_after_scan_is_not_moved(self):
+        keep = self.order(100)
+        move = self.order(100)
+        orders = archivable_orders(90)
+        scanned = list(orders.values_list('pk', flat=True))
+        # Changed between the id scan and the batch transaction
+        Order.objects.filter(pk=keep).update(state=OrderState.OUT_FOR_DELIVERY)
+
+        self.assertEqual(archive_batch(orders, scanned), 1)
+        self.assertEqual(list(ArchivedOrder.objects.values_list('pk', flat=True)), [move])
+        self.assertTrue(OrderItem.objects.filter(order_id=keep).exists())
+
+    def test_include_archived_pages_over_both_tables(self):
+        manager = User.objects.create_user('manager')
+        Group.objects.create(name='Manager').user_set.add(manager)
+        ids = [self.order(100) for _ in range(7)] + [self.order(5) for _ in range(5)]
+        archive_delivered_orders(older_than_days=90)
+        client = APIClient()
+        client.force_authenticate(manager)
+
+        first = client.get('/api/orders/?include_archived=1').data
+        second = client.get('/api/orders/?include_archived=1&page=2').data
+        self.assertEqual(first['count'], 12)
+        rows = first['results'] + second['results']
+        self.assertEqual([row['id'] for row in rows], ids)
+        self.assertEqual([row['archived'] for row in rows], [True] * 7 + [False] * 5)
+        self.assertIn('archived_at', rows[0])
+        self.assertIsNone(second['next'])
+        # Without the flag only live orders are listed
+        self.assertEqual(client.get('/api/orders/').data['count'], 5)
+
+    def test_include_archived_is_for_managers_only(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get('/api/orders/?include_archived=1').status_code, 403)
+
+
+# Reads stay on 'default', the only database a TestCase wraps
+@override_settings(READ_REPLICA_ALIAS=None)
+class ThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_throttles()
+        self.customer = User.objects.create_user('customer')
+        self.admin = User.objects.create_superuser('admin')
+        self.client = APIClient()
+
+    def test_checkout_is_throttled_with_retry_after(self):
+        self.client.force_authenticate(self.customer)
+        # checkout allows 5 per minute; an empty cart still spends a token
+        for _ in range(5):
+            self.assertEqual(self.client.post('/api/orders/').status_code, 400)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response['Retry-After']) <= 12)
+        # Reads on the same route are not checkout attempts
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+
+    def test_anonymous_menu_reads_are_throttled(self):
+        statuses = [self.client.get('/api/menu-items/').status_code for _ in range(31)]
+        self.assertEqual(statuses, [200] * 30 + [429])
+        # Buckets are per route
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+    def test_metrics_count_throttled_requests(self):
+        self.client.force_authenticate(self.customer)
+        for _ in range(7):
+            self.client.post('/api/orders/')
+        self.client.force_authenticate(self.admin)
+        metrics = self.client.get('/api/throttle-metrics/').data
+        self.assertEqual(metrics['checkout'], {'allowed': 5, 'throttled': 2})
+
+    def test_local_store_evicts_least_recently_used(self):
+        store = LocalBucketStore()
+        store.max_keys = 3
+        for key in ('a', 'b', 'c'):
+            store.consume(key, 3, 1e-6, 0)
+        store.consume('a', 3, 1e-6, 1)
+        store.consume('d', 3, 1e-6, 2)
+        self.assertEqual(list(store._buckets), ['c', 'a', 'd'])
+        # 'a' kept the two tokens it spent: one left, then empty
+        self.assertEqual(store.consume('a', 3, 1e-6, 3), 0)
+        self.assertGreater(store.consume('a', 3, 1e-6, 3), 0)
+
+    def test_cache_store_does_not_overspend_under_concurrency(self):
+        store = CacheBucketStore()
+        threads, attempts, capacity = 8, 10, 20
+        barrier = threading.Barrier(threads)
+        allowed = []
+
+        def spend():
+            barrier.wait()
+            for _ in range(attempts):
+                if not store.consume('throttle:test', capacity, 1e-6, time.time()):
+                    allowed.append(1)
+
+        workers = [threading.Thread(target=spend) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(allowed), capacity)
+
+
+class GroupMembershipBulkTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_throttles()
+        self.managers = Group.objects.create(name='Manager')
+        self.crew = Group.objects.create(name='Delivery Crew')
+        self.manager = User.objects.create_user('manager')
+        self.admin = User.objects.create_superuser('admin')
+        self.managers.user_set.add(self.manager)
+        for username in ('ann', 'bob', 'cat'):
+            User.objects.create_user(username)
+
+    def bulk(self, user, method, group, usernames):
+        client = APIClient()
+        # A fresh copy per request, as authentication would load it
+        client.force_authenticate(User.objects.get(pk=user.pk))
+        return getattr(client, method)(f'/api/groups/{group}/users/bulk/', {'usernames': usernames}, format='json')
+
+    def results(self, response):
+        return {row['username']: row['result'] for row in response.data['results']}
+
+    def test_add_reports_each_username(self):
+        self.managers.user_set.add(User.objects.get(username='bob'))
+        response = self.bulk(self.manager, 'post', 'manager', ['ann', 'bob', 'nobody', 'ann'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.results(response),
+            {'ann': 'added', 'bob': 'already_member', 'nobody': 'not_found'}
+        )
+        # Duplicates are reported once
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(
+            sorted(self.managers.user_set.values_list('username', flat=True)),
+            ['ann', 'bob', 'manager']
+        )
+
+    def test_remove_reports_each_username(self):
+        self.crew.user_set.add(User.objects.get(username='ann'))
+        response = self.bulk(self.admin, 'delete', 'delivery-crew', ['ann', 'bob', 'nobody'])
+        self.assertEqual(
+            self.results(response),
+            {'ann': 'removed', 'bob': 'not_member', 'nobody': 'not_found'}
+        )
+        self.assertFalse(self.crew.user_set.exists())
+
+    def test_permissions_match_single_user_views(self):
+        self.assertEqual(self.bulk(self.manager, 'post', 'delivery-crew', ['ann']).status_code, 403)
+        self.assertEqual(self.bulk(self.admin, 'post', 'delivery-crew', ['ann']).status_code, 200)
+        self.assertEqual(self.bulk(self.admin, 'post', 'manager', ['bob']).status_code, 403)
+        customer = User.objects.get(username='cat')
+        self.assertEqual(self.bulk(customer, 'post', 'manager', ['cat']).status_code, 403)
+        self.assertEqual(self.bulk(self.manager, 'post', 'owners', ['ann']).status_code, 404)
+        self.assertFalse(self.managers.user_set.filter(username__in=['bob', 'cat']).exists())
+
+    def test_role_changes_apply_to_the_next_request(self):
+        ann = User.objects.get(username='ann')
+        self.bulk(self.manager, 'post', 'manager', ['ann'])
+        self.assertEqual(self.bulk(ann, 'post', 'manager', ['bob']).status_code, 200)
+        self.bulk(self.manager, 'delete', 'manager', ['ann'])
+        self.assertEqual(self.bulk(ann, 'post', 'manager', ['cat']).status_code, 403)
+
+
+class MenuSnapshotTest(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        settings = override_settings(MENU_SNAPSHOT_ROOT=self.root, MENU_SNAPSHOT_AUTOPUBLISH=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.category = Category.objects.create(slug='mains', title='Mains')
+        self.item = MenuItem.objects.create(title='Pasta', price='9.50', featured=False, category=self.category)
+
+    def read(self, manifest, name, encoding='identity'):
+        return (self.root / manifest['snapshots'][name]['files'][encoding]).read_bytes()
+
+    def test_publish_writes_manifest_and_compressed_files(self):
+        manifest = publish_menu_snapshots()
+        self.assertEqual(read_manifest(self.root), manifest)
+        self.assertEqual(
+            set(manifest['snapshots']),
+            {'menu', 'categories', f'category-{self.category.pk}'}
+        )
+        menu = self.read(manifest, 'menu')
+        self.assertEqual(gzip.decompress(self.read(manifest, 'menu', 'gzip')), menu)
+        self.assertEqual(manifest['snapshots']['menu']['size'], len(menu))
+        items = json.loads(menu)['menu_items']
+        self.assertEqual([(item['title'], item['price']) for item in items], [('Pasta', '9.50')])
+
+    def test_unchanged_menu_publishes_the_same_files(self):
+        first = publish_menu_snapshots()
+        second = publish_menu_snapshots()
+        self.assertEqual(first['snapshots'], second['snapshots'])
+
+    def test_previous_generation_is_kept_and_older_ones_pruned(self):
+        generations = []
+        for price in ('9.50', '10.00', '10.50'):
+            MenuItem.objects.filter(pk=self.item.pk).update(price=price)
+            manifest = publish_menu_snapshots()
+            generations.append(manifest['snapshots']['menu']['files'].values())
+        oldest, previous, current = generations
+        files = {path.name for path in self.root.iterdir()}
+        self.assertTrue(set(current) <= files)
+        self.assertTrue(set(previous) <= files)
+        self.assertFalse(set(oldest) & files)
+
+    @override_settings(MENU_SNAPSHOT_AUTOPUBLISH=True)
+    def test_one_publish_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for n in range(3):
+                MenuItem.objects.create(title=f'Dish {n}', price='5.00', featured=False, category=self.category)
+            self.category.save()
+        self.assertEqual(len(callbacks), 1)
+        menu = json.loads(self.read(read_manifest(self.root), 'menu'))
+        self.assertEqual(len(menu['menu_items']), 4)
+
+    @override_settings(MENU_SNAPSHOT_AUTOPUBLISH=True)
+    def test_publish_rolled_back_with_savepoint_is_queued_again(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.category.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertFalse(publish_pending(connection))
+            self.category.save()
+        self.assertEqual(callbacks, [publish_after_commit])
+
+    def test_on_commit_entries_have_the_shape_publish_pending_reads(self):
+        # publish_pending() unpacks Django's private run_on_commit entries
+        with transaction.atomic():
+            transaction.on_commit(publish_after_commit)
+            entry = connection.run_on_commit[-1]
+            self.assertEqual(len(entry), 3)
+            self.assertIs(entry[1], publish_after_commit)
+            self.assertTrue(publish_pending(connection))
+            transaction.set_rollback(True)
+
+    def test_publish_renders_under_the_lock(self):
+        # A publish that waited for the lock writes the menu as it is then
+        published = []
+        real_lock = snapshots.publish_lock
+
+        @contextmanager
+        def lock_then_change(root):
+            with real_lock(root):
+                if not published:
+                    MenuItem.objects.filter(pk=self.item.pk).update(price='12.00')
+                published.append(1)
+                yield
+
+        with mock.patch.object(snapshots, 'publish_lock', lock_then_change):
+            manifest = publish_menu_snapshots()
+        items = json.loads(self.read(manifest, 'menu'))['menu_items']
+        self.assertEqual(items[0]['price'], '12.00')
+
+    @override_settings(MENU_SNAPSHOT_AUTOPUBLISH=True)
+    def test_raw_saves_do_not_publish(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            MenuItem(title='Soup', price='4.50', featured=False, category=self.category).save_base(raw=True)
+        self.assertEqual(callbacks, [])
+
+
+class MenuSnapshotFailureTest(TransactionTestCase):
+
+    def test_failed_publish_does_not_fail_the_write(self):
+        # A root that cannot be created: its parent is a regular file
+        tmp = tempfile.NamedTemporaryFile()
+        self.addCleanup(tmp.close)
+        reset_throttles()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('admin'))
+        with override_settings(MENU_SNAPSHOT_ROOT=Path(tmp.name) / 'snapshots', MENU_SNAPSHOT_AUTOPUBLISH=True):
+            with self.assertLogs('LittleLemonAPI.signals', 'ERROR'):
+                category = Category.objects.create(slug='mains', title='Mains')
+                response = client.post(
+                    '/api/menu-items/',
+                    {'title': 'Soup', 'price': '4.50', 'category_id': category.pk},
+                    format='json'
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(MenuItem.objects.filter(title='Soup').exists())
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTest(SimpleTestCase):
+    body = json.dumps([{'id': n, 'title': 'Lemon dessert'} for n in range(20)]).encode()
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/api/menu-items/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None, **headers):
+        return HttpResponse(self.body if body is None else body, content_type='application/json', headers=headers)
+
+    def test_compresses_large_responses(self):
+        response = self.respond(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_responses_are_sent_as_is_with_vary(self):
+        response = self.respond(self.json_response(b'{"id": 1}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'{"id": 1}')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_refused_encodings_are_not_used(self):
+        for header in ('gzip;q=0', 'identity', '', '*;q=0'):
+            response = self.respond(self.json_response(), header)
+            self.assertFalse(response.has_header('Content-Encoding'), header)
+            self.assertEqual(response.content, self.body)
+
+    def test_wildcard_accepts_gzip(self):
+        self.assertIn(self.respond(self.json_response(), '*')['Content-Encoding'], ('br', 'zstd', 'gzip'))
+        self.assertEqual(self.respond(self.json_response(), 'br;q=0, zstd;q=0, *')['Content-Encoding'], 'gzip')
+
+    def test_negotiation_follows_q_values(self):
+        codecs = {'br': None, 'gzip': None}
+        self.assertEqual(negotiate_encoding('gzip, br', codecs), 'br')
+        self.assertEqual(negotiate_encoding('gzip;q=1.0, br;q=0.5', codecs), 'gzip')
+        self.assertEqual(negotiate_encoding('GZIP', codecs), 'gzip')
+        self.assertEqual(negotiate_encoding('br;q=0, *;q=0.1', codecs), 'gzip')
+        self.assertEqual(negotiate_encoding('deflate, identity', codecs), None)
+        self.assertEqual(negotiate_encoding('gzip;q=bogus', codecs), None)
+
+    def test_strong_etag_is_weakened(self):
+        response = self.respond(self.json_response(ETag='"abc"'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        response = self.respond(self.json_response(ETag='W/"abc"'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_skips_encoded_streaming_and_binary_responses(self):
+        encoded = self.respond(self.json_response(**{'Content-Encoding': 'br'}))
+        self.assertEqual(encoded['Content-Encoding'], 'br')
+        self.assertEqual(encoded.content, self.body)
+        self.assertFalse(encoded.has_header('Vary'))
+
+        streaming = self.respond(StreamingHttpResponse([self.body], content_type='application/json'))
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(streaming.streaming_content), self.body)
+
+        image = self.respond(HttpResponse(self.body, content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+    def test_html_pages_are_not_compressed(self):
+        # Browsable API pages embed the CSRF token
+        html = b'<input name="csrfmiddlewaretoken" value="secret">' * 20
+        response = self.respond(HttpResponse(html, content_type='text/html; charset=utf-8'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, html)
+
+    def test_incompressible_body_is_sent_as_is(self):
+        body = os.urandom(2000)
+        response = self.respond(self.json_response(body))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    payloads = [
+        None,
+        {'count': 2, 'next': None, 'results': [{'id': 1, 'total': '12.50', 'status': False}]},
+        {'price': Decimal('9.50'), 'ratio': 1.5, 'big': 2 ** 60, 'negative': -3},
+        {'at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc), 'day': date(2024, 5, 1)},
+        {'id': uuid.UUID(int=7), 'label': gettext_lazy('Menu')},
+        {'title': 'Crème brûlée – 🍋', 'line': 'a\u2028b\u2029c', 'quote': '"</script>"'},
+        {1: 'int key', 'nested': [[], {}, [None, True]]},
+        {'huge': 2 ** 64, 'tiny': -(2 ** 63) - 1, 'limit': 2 ** 64 - 1},
+        {'floats': [1e16, 1e-7, -0.0, 0.1 + 0.2], 'key': {2.5: 'float key'}},
+        ({'at': (1e300,)},),
+        [],
+        'plain',
+    ]
+
+    def test_bytes_match_json_renderer(self):
+        for data in self.payloads:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), data)
+
+    def test_nan_is_rejected_like_json_renderer(self):
+        for data in [float('nan'), {'total': float('inf')}, [[float('-inf')]]]:
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(data)
+
+    def test_indented_output_matches_json_renderer(self):
+        data = self.payloads[1]
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+
+# Wall-time ceiling per request in ms; QUERY_BUDGET_TIME_FACTOR stretches
+# every time budget on slow machines without touching the query counts
+DEFAULT_BUDGET_MS = 250
+TIME_FACTOR = float(os.environ.get('QUERY_BUDGET_TIME_FACTOR', 1))
+PASSWORD = 'lemon-Pass-2024'
+
+# One API call made as `role` ('anonymous', 'customer', 'crew', 'manager' or
+# 'admin'). `path` is relative to /api/ and may use the ids from
+# QueryBudgetTest.build_dataset, e.g. 'orders/{order}/'. `queries` is the most
+# SQL statements the call may run at any data scale.
+Budget = namedtuple(
+    'Budget',
+    ['role', 'method', 'path', 'queries', 'status', 'data', 'ms'],
+    defaults=[200, None, DEFAULT_BUDGET_MS]
+)
+
+BUDGETS = [
+    # Menu and categories
+    Budget('anonymous', 'get', '', 0),
+    Budget('anonymous', 'get', 'menu-items/', 2),
+    Budget('anonymous', 'get', 'menu-items/?category={category_slug}', 2),
+    Budget('anonymous', 'get', 'menu-items/{menuitem}/', 1),
+    Budget('customer', 'get', 'menu-items/', 2),
+    Budget('customer', 'post', 'menu-items/', 0, 403, {'title': 'Soup', 'price': '4.50', 'category_id': '{category}'}),
+    Budget('admin', 'post', 'menu-items/', 2, 201, {'title': 'Soup', 'price': '4.50', 'category_id': '{category}'}),
+    Budget('admin', 'patch', 'menu-items/{menuitem}/', 2, 200, {'featured': True}),
+    Budget('admin', 'delete', 'menu-items/{menuitem}/', 5, 204),
+    Budget('anonymous', 'get', 'categories/', 2),
+    Budget('anonymous', 'get', 'categories/{category}/', 1),
+    Budget('manager', 'post', 'categories/', 0, 403, {'title': 'Sides', 'slug': 'sides'}),
+    Budget('admin', 'post', 'categories/', 1, 201, {'title': 'Sides', 'slug': 'sides'}),
+    Budget('admin', 'put', 'categories/{category}/', 2, 200, {'title': 'Mains', 'slug': 'mains'}),
+    Budget('admin', 'delete', 'categories/{empty_category}/', 3, 204),
+    # Cart
+    Budget('anonymous', 'get', 'cart/menu-items/', 0, 401),
+    Budget('customer', 'get', 'cart/menu-items/', 2),
+    Budget('customer', 'post', 'cart/menu-items/', 2, 201, {'menuitem': '{menuitem}', 'quantity': 2}),
+    Budget('customer', 'get', 'cart/menu-items/{cart}/', 1),
+    Budget('customer', 'patch', 'cart/menu-items/{cart}/', 2, 200, {'quantity': 3}),
+    Budget('customer', 'delete', 'cart/menu-items/{cart}/', 2, 204),
+    Budget('crew', 'get', 'cart/menu-items/{cart}/', 1, 404),
+    # Orders
+    Budget('anonymous', 'get', 'orders/', 0, 401),
+    Budget('customer', 'get', 'orders/', 3),
+    Budget('customer', 'get', 'orders/?include_archived=1', 1, 403),
+    Budget('customer', 'post', 'orders/', 8, 201),
+    Budget('customer', 'get', 'orders/{order}/', 2),
+    Budget('customer', 'patch', 'orders/{order}/', 2, 403, {'state': 'delivered'}),
+    Budget('crew', 'get', 'orders/', 3),
+    Budget('crew', 'get', 'orders/{order}/', 2),
+    Budget('crew', 'patch', 'orders/{order}/', 6, 200, {'state': 'out_for_delivery', 'version': 1}),
+    Budget('manager', 'get', 'orders/', 3),
+    Budget('manager', 'get', 'orders/?include_archived=1', 5),
+    Budget('manager', 'patch', 'orders/{order}/', 7, 200, {'delivery_crew': '{crew_member_username}', 'version': 1}),
+    # Group membership
+    Budget('manager', 'get', 'groups/manager/users/', 2),
+    Budget('manager', 'post', 'groups/manager/users/', 4, 201, {'username': '{guest_username}'}),
+    Budget('customer', 'post', 'groups/manager/users/', 1, 403, {'username': '{guest_username}'}),
+    Budget('manager', 'get', 'groups/manager/users/{manager_member}/', 1),
+    Budget('manager', 'delete', 'groups/manager/users/{manager_member}/', 4, 204),
+    Budget('manager', 'get', 'groups/delivery-crew/users/', 0, 403),
+    Budget('admin', 'get', 'groups/delivery-crew/users/', 2),
+    Budget('admin', 'post', 'groups/delivery-crew/users/', 3, 200, {'username': '{guest_username}'}),
+    Budget('admin', 'delete', 'groups/delivery-crew/users/{crew_member}/', 3, 200),
+    Budget('admin', 'post', 'groups/delivery-crew/users/bulk/', 4, 200, {'usernames': '{guest_usernames}'}),
+    Budget('admin', 'delete', 'groups/delivery-crew/users/bulk/', 4, 200, {'usernames': '{crew_member_usernames}'}),
+    Budget('manager', 'post', 'groups/delivery-crew/users/bulk/', 0, 403, {'usernames': '{guest_usernames}'}),
+    Budget('manager', 'post', 'groups/manager/users/bulk/', 5, 200, {'usernames': '{guest_usernames}'}),
+    Budget('manager', 'delete', 'groups/manager/users/bulk/', 5, 200, {'usernames': '{manager_member_usernames}'}),
+    Budget('customer', 'post', 'groups/manager/users/bulk/', 1, 403, {'usernames': '{guest_usernames}'}),
+    Budget('admin', 'get', 'throttle-metrics/', 0),
+    Budget('manager', 'get', 'throttle-metrics/', 0, 403),
+    # Accounts and tokens (djoser)
+    Budget('anonymous', 'post', 'users/', 4, 201, {'username': 'newcomer', 'email': 'new@example.com', 'password': PASSWORD}),
+    Budget('customer', 'get', 'users/', 2),
+    Budget('admin', 'get', 'users/', 2),
+    Budget('customer', 'get', 'users/me/', 0),
+    Budget('customer', 'get', 'users/{customer_username}/', 1),
+    Budget('customer', 'post', 'users/set_password/', 1, 204, {'current_password': PASSWORD, 'new_password': 'lemon-Pass-2025'}),
+    Budget('customer', 'post', 'users/set_username/', 2, 204, {'current_password': PASSWORD, 'new_username': 'renamed'}),
+    Budget('anonymous', 'post', 'users/activation/', 0, 400, {'uid': 'x', 'token': 'y'}),
+    Budget('anonymous', 'post', 'users/resend_activation/', 1, 400, {'email': 'customer@example.com'}),
+    Budget('anonymous', 'post', 'users/reset_password/', 1, 204, {'email': 'customer@example.com'}),
+    Budget('anonymous', 'post', 'users/reset_password_confirm/', 0, 400, {'uid': 'x', 'token': 'y', 'new_password': PASSWORD}),
+    Budget('anonymous', 'post', 'users/reset_username/', 1, 204, {'email': 'customer@example.com'}),
+    Budget('anonymous', 'post', 'users/reset_username_confirm/', 1, 400, {'uid': 'x', 'token': 'y', 'new_username': 'renamed'}),
+    Budget('anonymous', 'post', 'token/login/', 6, 200, {'username': '{customer_username}', 'password': PASSWORD}),
+    Budget('customer', 'post', 'token/logout/', 1, 204),
+]
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        # A lone placeholder keeps the id's type, e.g. a list of usernames
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def url_routes(patterns, prefix=''):
+    for pattern in patterns:
+        # Joined the way ResolverMatch.route joins them
+        route = prefix + str(pattern.pattern).removeprefix('^')
+        if isinstance(pattern, URLResolver):
+            yield from url_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route
+
+
+@override_settings(
+    MENU_SNAPSHOT_AUTOPUBLISH=False,
+    # Reads stay on 'default', which is the only database this test wraps
+    READ_REPLICA_ALIAS=None,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class QueryBudgetTest(TestCase):
+    """
+    Calls every endpoint in BUDGETS at several data scales and fails if a
+    call runs more SQL than its budget, takes longer than its time budget or
+    answers with an unexpected status. Query budgets are the same at every
+    scale, so a query per row (N+1) fails as soon as the data grows.
+    Set QUERY_BUDGET_REPORT=1 to print what each call actually used.
+    """
+    scales = (1, 5, 25)
+
+    def setUp(self):
+        cache.clear()
+        reset_throttles()
+        self.users = {
+            'customer': User.objects.create_user('customer', 'customer@example.com', PASSWORD),
+            'crew': User.objects.create_user('crew', 'crew@example.com', PASSWORD),
+            'manager': User.objects.create_user('manager', 'manager@example.com', PASSWORD),
+            'admin': User.objects.create_superuser('admin', 'admin@example.com', PASSWORD),
+        }
+        self.managers = Group.objects.create(name='Manager')
+        self.crew = Group.objects.create(name='Delivery Crew')
+        self.managers.user_set.add(self.users['manager'])
+        self.crew.user_set.add(self.users['crew'])
+
+    def build_dataset(self, scale):
+        # `scale` rows of everything each endpoint lists or touches
+        customer, crew = self.users['customer'], self.users['crew']
+        categories = Category.objects.bulk_create(
+            Category(slug=f'category-{n}', title=f'Category {n}') for n in range(scale)
+        )
+        empty = Category.objects.create(slug='empty', title='Empty')
+        items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Dish {n}', price=5 + n, featured=n % 2 == 0, category=categories[n % scale])
+            for n in range(2 * scale)
+        )
+        carts = Cart.objects.bulk_create(
+            Cart(user=customer, menuitem=item, quantity=1, unit_price_cents=item.price * 100, price_cents=item.price * 100)
+            for item in items[:scale]
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=customer, delivery_crew=crew, state=OrderState.ASSIGNED, version=1, total_cents=1000)
+            for _ in range(scale)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price_cents=500, price_cents=500)
+            for order in orders for item in items[:2]
+        )
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(
+                id=10 ** 6 + n, user=customer, delivery_crew=crew, state=OrderState.DELIVERED,
+                version=4, total_cents=1000, date=date(2020, 1, 1)
+            )
+            for n in range(scale)
+        )
+        guests = [User.objects.create_user(f'guest{n}') for n in range(scale)]
+        manager_members = [User.objects.create_user(f'manager{n}') for n in range(scale)]
+        crew_members = [User.objects.create_user(f'crew{n}') for n in range(scale)]
+        self.managers.user_set.add(*manager_members)
+        self.crew.user_set.add(*crew_members)
+        # Rows are in place; nothing cached while building may leak into a call
+        cache.clear()
+        return {
+            'category': categories[0].pk,
+            'category_slug': categories[0].slug,
+            'empty_category': empty.pk,
+            'menuitem': items[-1].pk,
+            'cart': carts[0].pk,
+            'order': Order.objects.filter(user=customer).order_by('pk').values_list('pk', flat=True).first(),
+            'manager_member': manager_members[0].pk,
+            'manager_member_usernames': [user.username for user in manager_members],
+            'crew_member': crew_members[0].pk,
+            'crew_member_username': crew_members[0].username,
+            'crew_member_usernames': [user.username for user in crew_members],
+            'guest_username': guests[0].username,
+            'guest_usernames': [user.username for user in guests],
+            'customer_username': customer.username,
+        }
+
+    def call(self, budget, ids):
+        client = APIClient()
+        if budget.role != 'anonymous':
+            # A fresh copy, so changes a rolled-back call made in memory are gone
+            user = User.objects.get(pk=self.users[budget.role].pk)
+            token = Token.objects.get_or_create(user=user)[0] if budget.path == 'token/logout/' else None
+            client.force_authenticate(user, token)
+        # Each call starts cold: nothing cached, a full throttle bucket
+        cache.clear()
+        reset_throttles()
+        path = '/api/' + fill(budget.path, ids)
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.databases]
+            start = time.perf_counter()
+            response = getattr(client, budget.method)(path, fill(budget.data, ids), format='json')
+            elapsed = (time.perf_counter() - start) * 1000
+        return path, response, elapsed, [query['sql'] for queries in captured for query in queries]
+
+    def check(self, budget, ids, scale):
+        # Run the call in a savepoint so writes do not leak into the next one
+        with transaction.atomic():
+            path, response, elapsed, queries = self.call(budget, ids)
+            transaction.set_rollback(True)
+
+        label = f'{budget.role} {budget.method.upper()} {path} (scale {scale})'
+        if os.environ.get('QUERY_BUDGET_REPORT'):
+            print(f'{label}: {response.status_code}, {len(queries)}/{budget.queries} queries, {elapsed:.1f} ms')
+        problems = []
+        if response.status_code != budget.status:
+            problems.append(f'status {response.status_code}, expected {budget.status}')
+        if len(queries) > budget.queries:
+            problems.append(f'{len(queries)} queries, budget {budget.queries}')
+        if elapsed > budget.ms * TIME_FACTOR:
+            problems.append(f'{elapsed:.0f} ms, budget {budget.ms * TIME_FACTOR:.0f} ms')
+        if not problems:
+            return None
+        sql = '\n'.join(f'  {n}. {query}' for n, query in enumerate(queries, 1))
+        return f'{label}: {", ".join(problems)}\n{sql}'
+
+    def test_endpoints_stay_within_budget(self):
+        # The first request pays for imports and URL compilation
+        APIClient().get('/api/')
+        failures = []
+        for scale in self.scales:
+            with transaction.atomic():
+                ids = self.build_dataset(scale)
+                for budget in BUDGETS:
+                    failure = self.check(budget, ids, scale)
+                    if failure:
+                        failures.append(failure)
+                transaction.set_rollback(True)
+        if failures:
+            self.fail(f'{len(failures)} budget(s) exceeded:\n\n' + '\n\n'.join(failures))
+
+    def test_every_route_has_a_budget(self):
+        # Format-suffix duplicates (menu-items.json) share their view's budget
+        routes = {
+            route for route in url_routes(urls.urlpatterns, 'api/')
+            if 'format' not in route
+        }
+        budgeted = set()
+        for budget in BUDGETS:
+            path = budget.path.split('?')[0]
+            budgeted.add(resolve('/api/' + path.format_map(ExampleIds())).route)
+        self.assertEqual(sorted(routes - budgeted), [])
+
+
+class ExampleIds(dict):
+    # Any placeholder resolves to a value every URL converter accepts
+    def __missing__(self, key):
+        return '1'
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+def parse_rate(rate):
+    """
+    '<requests>/<period>' as in DRF, e.g. '30/min'. Returns
+    (capacity, tokens refilled per second); the bucket holds up to
+    <requests> tokens and refills them evenly over the period.
+    """
+    num, period = rate.split('/')
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num), int(num) / seconds
+
+
+class LocalBucketStore:
+    """
+    Token buckets in process memory: one (tokens, timestamp) entry per key,
+    updated in O(1) under a lock. Past max_keys the least recently used
+    bucket is dropped, which is the one that has refilled the most.
+    """
+    max_keys = 100000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill, now):
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill
+            if not wait:
+                tokens -= 1
+            # Re-inserted at the end: most recently used
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets in the shared Django cache, so all workers see the same
+    budget; CACHES must point at a backend every worker shares. The read
+    and write of a bucket happen under a per-key lock taken with cache.add,
+    which is atomic, so concurrent requests cannot spend the same token.
+    The entry expires once the bucket would be full again.
+    """
+    # The lock expires on its own if its holder dies
+    lock_seconds = 1
+    # Give up waiting for the lock after this long and throttle the request
+    lock_wait = 0.05
+
+    def consume(self, key, capacity, refill, now):
+        lock = f'{key}:lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not cache.add(lock, 1, self.lock_seconds):
+            if time.monotonic() >= deadline:
+                return 1 / refill
+            time.sleep(0.001)
+        try:
+            tokens, stamp = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill
+            if not wait:
+                tokens -= 1
+            cache.set(key, (tokens, now), int(capacity / refill) + 1)
+            return wait
+        finally:
+            cache.delete(lock)
+
+    def clear(self):
+        # Entries expire on their own once the bucket is full again
+        pass
+
+
+_stores = {
+    'local': LocalBucketStore(),
+    'cache': CacheBucketStore(),
+}
+
+# Per-process counts of allowed and throttled requests, by scope
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def get_store():
+    return _stores[getattr(settings, 'THROTTLE_BUCKET_STORE', 'local')]
+
+
+def record(scope, allowed):
+    with _metrics_lock:
+        _metrics[(scope, 'allowed' if allowed else 'throttled')] += 1
+
+
+def throttle_metrics():
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    metrics = {}
+    for (scope, outcome), count in snapshot.items():
+        metrics.setdefault(scope, {'allowed': 0, 'throttled': 0})[outcome] = count
+    return metrics
+
+
+def reset_throttles():
+    for store in _stores.values():
+        store.clear()
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket keyed on user, auth token and route. `scope` picks the rate
+    from DEFAULT_THROTTLE_RATES; `methods` limits which requests spend
+    tokens and `applies_to` limits it to 'user' or 'anon' callers.
+    """
+    scope = None
+    methods = None
+    applies_to = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_ident_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            if self.applies_to == 'anon':
+                return None
+            token = getattr(request.auth, 'key', None)
+            return f'user:{user.pk}:{token}' if token else f'user:{user.pk}'
+        if self.applies_to == 'user':
+            return None
+        return f'anon:{self.get_ident(request)}'
+
+    def get_route(self, request, view):
+        match = request.resolver_match
+        return match.route if match else type(view).__name__
+
+    def allow_request(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return True
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        key = f'throttle:{self.scope}:{ident}:{self.get_route(request, view)}'
+        self.wait_seconds = get_store().consume(key, capacity, refill, time.time())
+        allowed = not self.wait_seconds
+        record(self.scope, allowed)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserRouteThrottle(TokenBucketThrottle):
+    scope = 'user'
+    applies_to = 'user'
+
+class AnonRouteThrottle(TokenBucketThrottle):
+    scope = 'anon'
+    applies_to = 'anon'
+
+class AnonMenuReadThrottle(TokenBucketThrottle):
+    scope = 'menu_anon'
+    methods = SAFE_METHODS
+    applies_to = 'anon'
+
+class CartWriteThrottle(TokenBucketThrottle):
+    scope = 'cart_write'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+class CheckoutThrottle(TokenBucketThrottle):
+    scope = 'checkout'
+    methods = ('POST',)
@@ -21,10 +21,10 @@ urlpatterns = [
    # User group endpoints
    path('groups/manager/users/', views.ManagerGroupListView.as_view(), name='manager-users-list'),
    path('groups/manager/users/<int:pk>/', views.ManagerGroupDetailView.as_view(), name='manager-users-detail'),
-   path('groups/delivery-crew/users/', views.DeliveryCrewGroupView.as_view(), {
-       'methods': ['GET', 'POST']
-   }), 
-   path('groups/delivery-crew/users/<int:userId>/', views.DeliveryCrewUserView.as_view(), {
-       'methods': ['DELETE']
-   })
+   path('groups/delivery-crew/users/', views.DeliveryCrewGroupView.as_view(), name='delivery-crew-users-list'),
+   path('groups/delivery-crew/users/<int:userId>/', views.DeliveryCrewUserView.as_view(), name='delivery-crew-users-detail'),
+   # Bulk membership changes: {"usernames": [...]}
+   path('groups/<slug:group>/users/bulk/', views.GroupMembershipBulkView.as_view(), name='group-users-bulk'),
+   # Throttle hit counts for this worker process
+   path('throttle-metrics/', views.ThrottleMetricsView.as_view(), name='throttle-metrics'),
 ]
\ No newline at end of file
@@ -1,51 +1,61 @@
 # Create your views here.
 from django.shortcuts import render
 from rest_framework import generics, viewsets, status
-from django.db.models import Sum
+from django.db.models import BooleanField, Sum, Value
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User, Group
 from django.db import transaction
-from .models import Category, MenuItem, Cart, Order, OrderItem
-from .serializers import CartItemSerializer, CategorySerializer, MenuItemSerializer, CartSerializer, OrderSerializer, UserGroupSerializer, UserSerializer
-from decimal import Decimal
+from .models import Category, MenuItem, Cart, Order, OrderItem, ArchivedOrder, OrderState
+from .serializers import ArchivedOrderSerializer, CartItemSerializer, CategorySerializer, MenuItemSerializer, CartSerializer, OrderSerializer, UserGroupSerializer, UserSerializer, UsernameListSerializer
+from .routers import ReplicaReadMixin, StickyWriteMixin
+from .money import to_cents
+from .lifecycle import OrderConflict, transition_order
+from .roles import GROUP_SLUGS, can_change_group, group_id, has_role
+from .throttling import AnonMenuReadThrottle, CartWriteThrottle, CheckoutThrottle, throttle_metrics
 
-class CategoryListView(generics.ListCreateAPIView):
+class CategoryListView(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [AnonMenuReadThrottle]
     
     def get_permissions(self):
         if self.request.method == 'GET':
             return []
         return [IsAdminUser()]
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [AnonMenuReadThrottle]
     
     def get_permissions(self):
         if self.request.method == 'GET':
             return []
         return [IsAdminUser()]
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [AnonMenuReadThrottle]
 
     def get_permissions(self):
         if self.action == 'list' or self.action == 'retrieve':
             return []
         return [IsAdminUser()]
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [IsAdminUser]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [AnonMenuReadThrottle]
     
     def get_permissions(self):
         if self.action == 'list' or self.action == 'retrieve':
@@ -53,7 +63,7 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         return [IsAdminUser()]
     
     def get_queryset(self):
-        queryset = MenuItem.objects.all()
+        queryset = MenuItem.objects.select_related('category')
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category__slug=category)
@@ -69,13 +79,17 @@ class CartView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         menuitem = serializer.validated_data['menuitem']
         quantity = serializer.validated_data['quantity']
-        unit_price = menuitem.price
-        price = unit_price * quantity
-        serializer.save(user=self.request.user, unit_price=unit_price, price=price)
+        unit_price_cents = to_cents(menuitem.price)
+        serializer.save(
+            user=self.request.user,
+            unit_price_cents=unit_price_cents,
+            price_cents=unit_price_cents * quantity
+        )
 
-class CartView(generics.ListCreateAPIView):
+class CartView(StickyWriteMixin, generics.ListCreateAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [CartWriteThrottle]
     
     def get_queryset(self):
         return Cart.objects.filter(user=self.request.user)
@@ -83,17 +97,17 @@ class CartView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         menuitem = serializer.validated_data['menuitem']
         quantity = serializer.validated_data['quantity']
-        unit_price = Decimal(str(menuitem.price))
-        price = unit_price * Decimal(str(quantity))
+        unit_price_cents = to_cents(menuitem.price)
         serializer.save(
             user=self.request.user,
-            unit_price=unit_price,
-            price=price
+            unit_price_cents=unit_price_cents,
+            price_cents=unit_price_cents * quantity
         )
 
-class CartItemView(generics.RetrieveUpdateDestroyAPIView):
+class CartItemView(StickyWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [CartWriteThrottle]
     
     def get_queryset(self):
         return Cart.objects.filter(user=self.request.user)
@@ -115,11 +129,10 @@ class CartItemView(generics.RetrieveUpdateDestroyAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update price based on new quantity
-        unit_price = Decimal(str(cart_item.unit_price))
+        # Update price based on new quantity (integer cents)
         cart_item.quantity = quantity
-        cart_item.price = unit_price * Decimal(str(quantity))
-        cart_item.save()
+        cart_item.price_cents = cart_item.unit_price_cents * quantity
+        cart_item.save(update_fields=['quantity', 'price_cents'])
         
         serializer = self.get_serializer(cart_item)
         return Response(serializer.data)
@@ -129,9 +142,9 @@ class OrderView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists():
+        if has_role(user, 'Manager'):
             return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
+        elif has_role(user, 'Delivery Crew'):
             return Order.objects.filter(delivery_crew=user)
         return Order.objects.filter(user=user)
     
@@ -142,40 +155,23 @@ class OrderView(generics.ListCreateAPIView):
         if not cart_items.exists():
             raise ValidationError("Cart is empty")
             
-        total = sum(item.price for item in cart_items)
+        total_cents = cart_items.aggregate(total=Sum('price_cents'))['total']
         
-        order = serializer.save(user=self.request.user, total=total)
+        order = serializer.save(user=self.request.user, total_cents=total_cents)
         
-        for cart_item in cart_items:
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                menuitem=cart_item.menuitem,
+                menuitem_id=cart_item.menuitem_id,
                 quantity=cart_item.quantity,
-                unit_price=cart_item.unit_price,
-                price=cart_item.price
+                unit_price_cents=cart_item.unit_price_cents,
+                price_cents=cart_item.price_cents
             )
+            for cart_item in cart_items
+        ])
         
         cart_items.delete()
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
-    serializer_class = OrderSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        user = self.request.user
-        if user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(user=user)
-    
-    def perform_update(self, serializer):
-        user = self.request.user
-        if user.groups.filter(name='Delivery Crew').exists():
-            serializer.save(status=serializer.validated_data['status'])
-        else:
-            serializer.save()
-
 
 class ManagerGroupListView(generics.ListCreateAPIView):
     serializer_class = UserSerializer
@@ -183,11 +179,10 @@ class ManagerGroupListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         # Only return users in Manager group
-        manager_group = Group.objects.get(name='Manager')
-        return User.objects.filter(groups=manager_group)
+        return User.objects.filter(groups__name='Manager')
     
     def post(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Manager').exists():
+        if not has_role(request.user, 'Manager'):
             return Response(
                 {'message': 'Permission denied'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -219,11 +214,10 @@ class ManagerGroupDetailView(generics.RetrieveDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        manager_group = Group.objects.get(name='Manager')
-        return User.objects.filter(groups=manager_group)
+        return User.objects.filter(groups__name='Manager')
     
     def delete(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Manager').exists():
+        if not has_role(request.user, 'Manager'):
             return Response(
                 {'message': 'Permission denied'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -234,18 +228,51 @@ class ManagerGroupDetailView(generics.RetrieveDestroyAPIView):
         manager_group.user_set.remove(user)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class OrderListView(generics.ListCreateAPIView):
+class OrderListView(ReplicaReadMixin, StickyWriteMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES + [CheckoutThrottle]
+    reads_own_writes = True
     
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists():
+        if has_role(user, 'Manager'):
             return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
+        elif has_role(user, 'Delivery Crew'):
             return Order.objects.filter(delivery_crew=user)
         return Order.objects.filter(user=user)
     
+    def list(self, request, *args, **kwargs):
+        # Live tables only, unless a manager explicitly asks for the archive too
+        if request.query_params.get('include_archived') != '1':
+            return super().list(request, *args, **kwargs)
+        if not has_role(request.user, 'Manager'):
+            return Response(
+                {'message': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Paginate over ids from both tables, then load just this page's rows
+        rows = Order.objects.values_list('id', Value(False, output_field=BooleanField())).union(
+            ArchivedOrder.objects.values_list('id', Value(True, output_field=BooleanField())),
+            all=True
+        ).order_by('id')
+        page = self.paginate_queryset(rows)
+        live_ids = [pk for pk, archived in page if not archived]
+        archived_ids = [pk for pk, archived in page if archived]
+        live = Order.objects.in_bulk(live_ids)
+        archived = ArchivedOrder.objects.in_bulk(archived_ids)
+        
+        data = []
+        for pk, is_archived in page:
+            if is_archived:
+                row = ArchivedOrderSerializer(archived[pk]).data
+            else:
+                row = OrderSerializer(live[pk]).data
+            row['archived'] = is_archived
+            data.append(row)
+        return self.get_paginated_response(data)
+    
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         # Get current user's cart items
@@ -257,27 +284,28 @@ class OrderListView(generics.ListCreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Calculate total from cart items
-        total = cart_items.aggregate(
-            total=Sum('price')
+        # Calculate total from cart items in the database
+        total_cents = cart_items.aggregate(
+            total=Sum('price_cents')
         )['total']
         
         # Create order
         order = Order.objects.create(
             user=request.user,
-            total=total,
-            status=False  # Initial status as not delivered
+            total_cents=total_cents
         )
         
         # Create OrderItem entries
-        for cart_item in cart_items:
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                menuitem=cart_item.menuitem,
+                menuitem_id=cart_item.menuitem_id,
                 quantity=cart_item.quantity,
-                unit_price=cart_item.unit_price,
-                price=cart_item.price
+                unit_price_cents=cart_item.unit_price_cents,
+                price_cents=cart_item.price_cents
             )
+            for cart_item in cart_items
+        ])
         
         # Clear user's cart
         cart_items.delete()
@@ -285,34 +313,58 @@ class OrderListView(generics.ListCreateAPIView):
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class OrderDetailView(generics.RetrieveUpdateAPIView):
+class OrderDetailView(StickyWriteMixin, generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
     
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists():
+        if has_role(user, 'Manager'):
             return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
+        elif has_role(user, 'Delivery Crew'):
             return Order.objects.filter(delivery_crew=user)
         return Order.objects.filter(user=user)
     
     def update(self, request, *args, **kwargs):
-        partial = kwargs.pop('partial', True)  # Set to True to allow PATCH
+        # Managers assign crew (placed/assigned -> assigned) and may make any
+        # allowed move; crew can only take their orders out and deliver them.
+        # Send the 'version' you read to avoid overwriting someone else's
+        # change: a stale version gets a 409.
         instance = self.get_object()
-        
-        if not request.user.groups.filter(name='Manager').exists():
+        is_manager = has_role(request.user, 'Manager')
+        if not is_manager and not has_role(request.user, 'Delivery Crew'):
             return Response({'message': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-            
+        
+        delivery_crew = None
+        to_state = request.data.get('state')
         delivery_crew_username = request.data.get('delivery_crew')
         if delivery_crew_username:
+            if not is_manager:
+                return Response({'message': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
             delivery_crew = get_object_or_404(User, username=delivery_crew_username)
-            instance.delivery_crew = delivery_crew
-            instance.save()
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
-            
-        return Response({'message': 'No delivery crew specified'}, status=status.HTTP_400_BAD_REQUEST)
+            to_state = to_state or OrderState.ASSIGNED
+        
+        if not to_state:
+            return Response({'message': 'No state or delivery crew specified'}, status=status.HTTP_400_BAD_REQUEST)
+        if to_state not in OrderState.values:
+            return Response({'state': f'Unknown state {to_state}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not is_manager and to_state not in (OrderState.OUT_FOR_DELIVERY, OrderState.DELIVERED):
+            return Response({'message': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        version = request.data.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except (TypeError, ValueError):
+                return Response({'version': 'Invalid version value'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            transition_order(instance, to_state, request.user, expected_version=version, delivery_crew=delivery_crew)
+        except OrderConflict as exc:
+            # Hand back the current state and version so the client can retry
+            return Response({'detail': exc.detail, **exc.current}, status=exc.status_code)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
 
 class OrderManagementView(generics.GenericAPIView):
@@ -321,9 +373,9 @@ class OrderManagementView(generics.GenericAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists():
+        if has_role(user, 'Manager'):
             return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
+        elif has_role(user, 'Delivery Crew'):
             return Order.objects.filter(delivery_crew=user)
         return Order.objects.filter(user=user)
     
@@ -334,12 +386,11 @@ class OrderManagementView(generics.GenericAPIView):
     
     def patch(self, request, pk=None):
         order = get_object_or_404(Order, pk=pk)
-        if request.user.groups.filter(name='Manager').exists():
+        if has_role(request.user, 'Manager'):
             delivery_crew_username = request.data.get('delivery_crew')
             if delivery_crew_username:
                 delivery_crew = get_object_or_404(User, username=delivery_crew_username)
-                order.delivery_crew = delivery_crew
-                order.save()
+                transition_order(order, OrderState.ASSIGNED, request.user, delivery_crew=delivery_crew)
                 serializer = self.get_serializer(order)
                 return Response(serializer.data, status=status.HTTP_200_OK)
         return Response({'message': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
@@ -366,8 +417,12 @@ class ManagerUserView(generics.GenericAPIView):
             return Response({'message': 'User removed from delivery crew'}, status=status.HTTP_200_OK)
         return Response({'message': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
 
-class DeliveryCrewGroupView(generics.GenericAPIView):
+class DeliveryCrewGroupView(generics.ListAPIView):
+    serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        return User.objects.filter(groups__name='Delivery Crew').order_by('pk')
     
     def post(self, request):
         username = request.data.get('username')
@@ -399,14 +454,11 @@ class DeliveryCrewUserView(generics.GenericAPIView):
             return Response({'message': 'User added to delivery crew'}, status=status.HTTP_200_OK)
         return Response({'message': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
     
-    def delete(self, request):
-        username = request.data.get('username')
-        if username:
-            user = get_object_or_404(User, username=username)
-            delivery_crew = Group.objects.get(name='Delivery Crew')
-            delivery_crew.user_set.remove(user)
-            return Response({'message': 'User removed from delivery crew'}, status=status.HTTP_200_OK)
-        return Response({'message': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
+    def delete(self, request, userId):
+        user = get_object_or_404(User, pk=userId)
+        delivery_crew = Group.objects.get(name='Delivery Crew')
+        delivery_crew.user_set.remove(user)
+        return Response({'message': 'User removed from delivery crew'}, status=status.HTTP_200_OK)
 
 class GroupManagementView(generics.GenericAPIView):
     permission_classes = [IsAdminUser]
@@ -421,4 +473,73 @@ class GroupManagementView(generics.GenericAPIView):
         user = get_object_or_404(User, username=request.data.get('username'))
         group = get_object_or_404(Group, name=group_name)
         group.user_set.remove(user)
-        return Response({'message': f'User removed from {group_name} group'}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'message': f'User removed from {group_name} group'}, status=status.HTTP_200_OK)
+
+
+class GroupMembershipBulkView(APIView):
+    """
+    Add (POST) or remove (DELETE) many users to/from a group in one request:
+    {"usernames": [...]}. Users are resolved with a single username__in
+    query and the membership rows are written in bulk. Managers may change
+    the Manager group and admins the Delivery Crew, as in the single-user
+    views.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, group):
+        return self.change_membership(request, group, add=True)
+    
+    def delete(self, request, group):
+        return self.change_membership(request, group, add=False)
+    
+    def change_membership(self, request, group, add):
+        group_name = GROUP_SLUGS.get(group)
+        if group_name is None:
+            return Response({'message': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not can_change_group(request.user, group_name):
+            return Response(
+                {'message': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        gid = group_id(group_name)
+        if gid is None:
+            return Response({'message': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        serializer = UsernameListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        usernames = list(dict.fromkeys(serializer.validated_data['usernames']))
+        
+        Membership = User.groups.through
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        member_ids = set(Membership.objects.filter(
+            group_id=gid, user_id__in=user_ids.values()
+        ).values_list('user_id', flat=True))
+        
+        if add:
+            changed = [pk for pk in user_ids.values() if pk not in member_ids]
+            Membership.objects.bulk_create(
+                [Membership(user_id=pk, group_id=gid) for pk in changed],
+                ignore_conflicts=True
+            )
+        else:
+            changed = list(member_ids)
+            Membership.objects.filter(group_id=gid, user_id__in=changed).delete()
+        
+        results = []
+        for username in usernames:
+            pk = user_ids.get(username)
+            if pk is None:
+                result = 'not_found'
+            elif add:
+                result = 'already_member' if pk in member_ids else 'added'
+            else:
+                result = 'removed' if pk in member_ids else 'not_member'
+            results.append({'username': username, 'result': result})
+        return Response({'group': group_name, 'results': results}, status=status.HTTP_200_OK)
+
+
+class ThrottleMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(throttle_metrics())